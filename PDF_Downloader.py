@@ -1,17 +1,35 @@
+import numpy as np
 import pandas as pd
 import glob
+import hashlib
+import logging
 import os
 import os.path
+import queue
+import re
+import socket
+import sys
 import threading
+from datetime import date
+from time import monotonic, sleep, time_ns
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener
 import requests
+from requests.adapters import HTTPAdapter
 from requests.packages import urllib3  
-from time import sleep
+from openpyxl import Workbook
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
+from pydrive2.files import ApiRequestError
 
 
 urllib3.disable_warnings(category=urllib3.exceptions.InsecureRequestWarning)
 
+# Logger for progress messages from the download and upload threads
+logger = logging.getLogger(__name__)
+
 # The name of the column that contains the unique ID for each report
 ID_COLUMN = 'BRnum'
 
@@ -21,6 +39,37 @@ MAX_DOWNLOADS = 10
 # Maximum number of files to download at the same time
 MAX_CONCURRENT_THREADS = 5
 
+# Number of bytes written to disk at a time while downloading
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of files to upload to Google Drive at the same time
+MAX_UPLOAD_THREADS = 8
+
+# Folder inside the output directory where each run's download status is saved
+STATUS_PARTS_DIR = 'status_parts'
+
+# Seconds to wait for a server to accept the connection
+CONNECT_TIMEOUT = 5
+
+# Seconds to wait for the server to send data once connected
+READ_TIMEOUT = 30
+
+# Number of times a failed request is retried before giving up
+MAX_RETRIES = 2
+
+# Download URLs must be http(s) web addresses. Only the scheme is checked -
+# requests handles spaces and other characters inside the address itself
+URL_PATTERN = re.compile(r'^https?://', re.IGNORECASE)
+
+# Number of daily metadata backups kept in the output directory
+METADATA_BACKUPS_TO_KEEP = 5
+
+# Number of seconds a cached DNS lookup is reused before asking again
+DNS_CACHE_TTL = 300
+
+# Maximum number of DNS lookups kept in the cache
+DNS_CACHE_MAX_ENTRIES = 1024
+
 # Main data directory
 DATA_DIR = 'Data'
 
@@ -37,9 +86,91 @@ DOWNLOAD_DIR = os.path.join(DATA_DIR, 'Downloads')
 OUTPUT_DIR = os.path.join(DATA_DIR, 'Output')
 
 
+# Cached DNS results, shared by all downloads in this process
+_dns_cache = {}
+_dns_cache_lock = threading.Lock()
+_original_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(*args, **kwargs):
+    """
+    Drop-in replacement for socket.getaddrinfo that remembers results.
+    
+    Many reports are hosted on the same sites, so repeated lookups for the
+    same host are answered from memory until DNS_CACHE_TTL runs out.
+    """
+    key = (args, tuple(sorted(kwargs.items())))
+    now = monotonic()
+    
+    with _dns_cache_lock:
+        cached = _dns_cache.get(key)
+    if cached is not None and now - cached[0] < DNS_CACHE_TTL:
+        return cached[1]
+    
+    # Not cached or expired - do a real lookup
+    result = _original_getaddrinfo(*args, **kwargs)
+    with _dns_cache_lock:
+        # Make room when the cache is full: first drop expired lookups, then
+        # the oldest ones (the dict keeps lookups in the order they were made)
+        _dns_cache.pop(key, None)
+        if len(_dns_cache) >= DNS_CACHE_MAX_ENTRIES:
+            for old_key in [k for k, (when, _) in _dns_cache.items() if now - when >= DNS_CACHE_TTL]:
+                del _dns_cache[old_key]
+        while len(_dns_cache) >= DNS_CACHE_MAX_ENTRIES:
+            del _dns_cache[next(iter(_dns_cache))]
+        _dns_cache[key] = (now, result)
+    return result
+
+
+def enable_dns_cache():
+    """Route all DNS lookups in this process through the cache."""
+    socket.getaddrinfo = _cached_getaddrinfo
+
+
+def disable_dns_cache():
+    """Use the normal DNS lookups again and forget the cached results."""
+    socket.getaddrinfo = _original_getaddrinfo
+    with _dns_cache_lock:
+        _dns_cache.clear()
+
+
+def write_excel(df, path):
+    """
+    Save a DataFrame to an xlsx file using openpyxl's write-only mode.
+    
+    This streams the rows straight to the file without building the styled
+    worksheet that DataFrame.to_excel creates, which is much faster for
+    large files. The index is not written.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(list(df.columns))
+    
+    # Write missing values as empty cells
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        worksheet.append(row)
+    
+    workbook.save(path)
+
+
+def file_md5(path):
+    """Calculate the MD5 checksum of a file, reading it 1 MiB at a time."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
 class PDF_Downloader:
     """
     A class to handle the downloading of PDF files from URLs.
+    
+    Progress and errors are reported through the module's logger at INFO and
+    ERROR level. main() sets up the console output; when the class is used on
+    its own, configure logging first to see them, e.g.
+    logging.basicConfig(level=logging.INFO, format='%(message)s').
     """
     def __init__(self):
         # Initialize the class with default settings
@@ -52,65 +183,159 @@ class PDF_Downloader:
         self.download_dir = DOWNLOAD_DIR
         self.output_dir = OUTPUT_DIR
         
+        # Guards download_errors, which all download threads write to
+        self._errors_lock = threading.Lock()
+        
+        # Share one HTTP session between all downloads so connections to the
+        # same host are kept alive and reused instead of reconnecting every time
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=max(32, self.max_concurrent_threads * 2),
+            max_retries=urllib3.util.Retry(total=MAX_RETRIES, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
     def get_existing_downloads(self):
         """
         Check which PDF files have already been downloaded.
         
         Returns:
-            list: IDs of PDF files that already exist in the download folder
+            set: IDs of PDF files that already exist in the download folder
+        """
+        # Scan the download directory once, taking the ID portion from each
+        # PDF filename (removing .pdf extension)
+        try:
+            with os.scandir(self.download_dir) as entries:
+                return {
+                    entry.name[:-4] for entry in entries
+                    if entry.name.endswith('.pdf') and entry.is_file(follow_symlinks=False)
+                }
+        except FileNotFoundError:
+            # Nothing has been downloaded yet
+            return set()
+        
+    def load_reports(self):
+        """
+        Read the reports Excel file, using a cached copy when possible.
+        
+        Parsing the large xlsx file is slow, so the parsed data is saved as a
+        pickle file in the output folder, together with the modification time
+        and size of the Excel file and the ID column it was read with. The
+        cache is only used while all of these still match exactly, so a
+        replaced file is noticed even if it has an older modification time.
+        
+        Returns:
+            DataFrame: Reports data indexed by the ID column
+        """
+        cache_name = os.path.splitext(os.path.basename(self.reports_path))[0] + '_cache.pkl'
+        cache_path = os.path.join(self.output_dir, cache_name)
+        
+        # Identify the version of the Excel file being read. A missing file is
+        # reported by read_excel below
+        try:
+            stat = os.stat(self.reports_path)
+            source = (stat.st_mtime_ns, stat.st_size, self.id_column)
+        except FileNotFoundError:
+            source = None
+        
+        # Use the cache if it was made from this exact version of the file. A
+        # cache that can't be read is ignored and replaced below
+        if source is not None and os.path.exists(cache_path):
+            try:
+                cached = pd.read_pickle(cache_path)
+            except Exception as e:
+                logger.info("   Ignoring unreadable reports cache: %s", e)
+                cached = None
+            if isinstance(cached, dict) and cached.get('source') == source:
+                logger.info("   Using cached reports data")
+                return cached['data']
+        
+        # Read the Excel file, keeping IDs as text so they match the file names
+        reports_data = pd.read_excel(
+            self.reports_path,
+            sheet_name=0,
+            index_col=self.id_column,
+            dtype={self.id_column: str}
+        )
+        
+        # Save the parsed data for next time. It is written to a temporary file
+        # first so an interrupted run never leaves a half-written cache
+        partial_path = f"{cache_path}.{uuid4().hex}.part"
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            pd.to_pickle({'source': source, 'data': reports_data}, partial_path)
+            os.replace(partial_path, cache_path)
+        except Exception as e:
+            logger.info("   Could not save reports cache: %s", e)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        
+        return reports_data
+        
+    def get_download_urls(self, reports_data):
         """
-        # Get list of all PDF files in the download directory
-        downloaded_files = glob.glob(os.path.join(self.download_dir, "*.pdf")) 
+        Pick the URL to download for every report at once.
         
-        # Extract just the ID portion from each filename (removing .pdf extension)
-        existing_ids = [os.path.basename(f)[:-4] for f in downloaded_files]
+        The PDF URL is preferred, falling back to the HTML address when
+        there is no PDF URL.
         
-        return existing_ids
+        Returns:
+            Series: Download URL for each report (missing if it has neither)
+        """
+        return reports_data['Pdf_URL'].where(reports_data['Pdf_URL'].notna(), reports_data['Report Html Address'])
         
     def download_file(self, index, row, download_errors):
         """Implementation of download_file method"""
         # Original implementation moved to class method
         success = False
+        file_path = os.path.join(self.download_dir, f"{index}.pdf")
+        partial_path = file_path + '.part'
         try:
-            # Figure out which URL to use - prefer PDF_URL if available
-            if pd.notna(row['Pdf_URL']):
-                url = row['Pdf_URL']
-                print(f"Downloading {index} from PDF URL...")
-            else:
-                url = row['Report Html Address']
-                print(f"Downloading {index} from HTML URL...")
-            
-            # Download the file content
-            # verify=False skips SSL certificate validation
-            response = requests.get(url, verify=False, timeout=30)
+            # The URL to use was picked for every report before downloading
+            url = row['url']
+            logger.info("Downloading %s from %s...", index, url)
             
-            # Check if the download was successful
-            response.raise_for_status()
+            # Download the file content in chunks instead of holding the whole
+            # PDF in memory. verify=False skips SSL certificate validation
+            with self.session.get(url, verify=False, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True) as response:
+                # Check if the download was successful
+                response.raise_for_status()
+                
+                # Write to a temporary .part file so an interrupted download never
+                # looks like a finished PDF
+                with open(partial_path, 'wb') as f:
+                    write = f.write
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            write(chunk)
             
-            # Save the content to a PDF file
-            file_path = os.path.join(self.download_dir, f"{index}.pdf")
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
+            # Move the finished file into place
+            os.replace(partial_path, file_path)
             
             success = True
         except requests.exceptions.RequestException as e:
             # Handle network or URL errors
             error_message = f"Network error: {e}"
-            download_errors.append(index)
-            download_errors.append(error_message)
-            print(f"Error downloading {index}: {error_message}")
+            with self._errors_lock:
+                download_errors[index] = error_message
+            logger.error("Error downloading %s: %s", index, error_message)
         except Exception as e:
             # Handle any other errors
             error_message = f"Unexpected error: {e}"
-            download_errors.append(index)
-            download_errors.append(error_message)
-            print(f"Error downloading {index}: {error_message}")
+            with self._errors_lock:
+                download_errors[index] = error_message
+            logger.error("Error downloading %s: %s", index, error_message)
         finally:
             # Report whether the download succeeded or failed
             if success:
-                print(f"✓ Successfully downloaded {index}")
+                logger.info("✓ Successfully downloaded %s", index)
             else:
-                print(f"✗ Failed to download {index}")
+                # Remove any half-written file left behind by the failed download
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                logger.info("✗ Failed to download %s", index)
                 
     def download_pdfs(self, download_queue, download_errors):
         """Moved download_pdfs to class method"""
@@ -118,143 +343,176 @@ class PDF_Downloader:
         os.makedirs(self.download_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # Reports whose URL isn't a web address can never be downloaded, so
+        # record them as failed for the whole queue at once instead of
+        # sending a request for each one. Some URLs in the reports file have
+        # spaces around them, which are removed first
+        urls = download_queue['url'].astype(str).str.strip()
+        valid_urls = urls.str.match(URL_PATTERN)
+        for index, url in download_queue.loc[~valid_urls, 'url'].items():
+            download_errors[index] = f"Invalid URL: {url}"
+            logger.error("Error downloading %s: Invalid URL: %s", index, url)
+        download_queue = download_queue.assign(url=urls)[valid_urls]
+        
         # Show how many files we'll be downloading
         total_files = len(download_queue)
-        print(f"\nStarting download of {total_files} files\n")
-        
-        # Create and start threads for each download
-        threads = []
-        files_started = 0
-        
-        for index, row in download_queue.iterrows():
-            # Create a thread for this download
-            thread = threading.Thread(
-                target=self.download_file,
-                args=(index, row, download_errors),
-                name=f"Download-{index}"
-            )
-            threads.append(thread)
-            
-            # Start the thread
-            thread.start()
-            files_started += 1
-            
-            # Show progress
-            print(f"Started download {files_started}/{total_files} ({index})")
+        logger.info("Starting download of %d files", total_files)
+        
+        # download_errors is bound once here rather than passed with every task
+        download = partial(self.download_file, download_errors=download_errors)
+        
+        # Hand the downloads to a pool of worker threads. The pool never runs
+        # more than max_concurrent_threads downloads at once and reuses its
+        # threads for the rest of the queue
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_threads, thread_name_prefix='Download') as executor:
+            submit = executor.submit
+            futures = {
+                submit(download, index, row): index
+                for index, row in download_queue.iterrows()
+            }
             
-            # If we've reached the max concurrent downloads, wait for one to finish
-            # before starting more downloads
-            while sum(1 for t in threads if t.is_alive()) >= self.max_concurrent_threads:
-                print(f"Reached max concurrent downloads ({self.max_concurrent_threads}). Waiting...")
-                sleep(0.5)  # Wait 0.5 second before checking again
-        
-        # Wait for all threads to complete
-        active_threads = sum(1 for t in threads if t.is_alive())
-        while active_threads > 0:
-            print(f"Waiting for {active_threads} downloads to complete...")
-            sleep(1)  # Check every 2 seconds
-            active_threads = sum(1 for t in threads if t.is_alive())
+            # Show progress as each download finishes
+            files_finished = 0
+            for future in as_completed(futures):
+                # Re-raise anything download_file did not handle itself
+                future.result()
+                files_finished += 1
+                logger.info("Finished download %d/%d (%s)", files_finished, total_files, futures[future])
         
         # Final completion message
-        print("\nAll downloads finished\n")
+        logger.info("All downloads finished")
         
     def create_output_report(self, download_queue, download_errors):
-        """Moved create_output_report to class method"""
-        # Similar implementation as before but using self.xxx for paths
-        # ...existing implementation changed to use class variables...
-        print("Creating download status report...")
+        """
+        Save the download status of this run.
+        
+        The status is saved as a new part in the status_parts folder, and
+        Download_Status.xlsx is not changed - run() calls compact_status()
+        afterwards to rebuild it from the parts.
+        """
+        logger.info("Creating download status report...")
+        
+        # Look up every downloaded file once instead of checking each report
+        existing_downloads = self.get_existing_downloads()
         
         output = []
-        for index, row in download_queue.iterrows():
+        for index in download_queue.index:
             # Check if this file was downloaded successfully
-            if os.path.exists(os.path.join(self.download_dir, f"{index}.pdf")):
+            if str(index) in existing_downloads:
                 output.append([index, "Downloaded", ""])
             else:
                 # Find the error message if there was one
-                error_msg = ""
-                if index in download_errors:
-                    error_idx = download_errors.index(index)
-                    if error_idx + 1 < len(download_errors):
-                        error_msg = str(download_errors[error_idx + 1])
-                else:
-                    error_msg = "File not found"
+                error_msg = str(download_errors.get(index, "File not found"))
                 output.append([index, "Failed", error_msg])
 
         # Create a DataFrame from the output data
         new_output_df = pd.DataFrame(output, columns=["Brnum", "Status", "Error Message"])
         
-        # Define the output file path
+        # Status history is kept as one small file per run, so adding this run's
+        # results never needs the whole history to be read and rewritten
+        parts_dir = os.path.join(self.output_dir, STATUS_PARTS_DIR)
         output_path = os.path.join(self.output_dir, "Download_Status.xlsx")
+        if not os.path.exists(parts_dir):
+            os.makedirs(parts_dir)
+            # Carry over the history from a report made before parts were used
+            if os.path.exists(output_path):
+                logger.info("Importing existing download status report: %s", output_path)
+                try:
+                    existing_df = pd.read_excel(output_path)
+                    existing_df.to_pickle(self._new_status_part_path())
+                except Exception as e:
+                    logger.error("Error reading existing report file: %s", e)
+                    logger.info("Starting a new report history instead.")
         
-        # Check if the file already exists
-        if os.path.exists(output_path):
-            print(f"Appending to existing download status report: {output_path}")
-            # Read the existing file
-            try:
-                existing_df = pd.read_excel(output_path)
-                # Combine existing data with new data
-                output_df = pd.concat([existing_df, new_output_df], ignore_index=True)
-                # Remove duplicates, keeping the latest entry if there's a conflict
-                output_df.drop_duplicates(subset=["Brnum"], keep="last", inplace=True)
-            except Exception as e:
-                print(f"Error reading existing report file: {e}")
-                print("Creating a new report file instead.")
-                output_df = new_output_df
-        else:
-            print("Creating new download status report.")
-            output_df = new_output_df
+        part_path = self._new_status_part_path()
+        new_output_df.to_pickle(part_path)
+        logger.info("Saved %s status entries to: %s", len(new_output_df), part_path)
+    
+    def _new_status_part_path(self):
+        """Return a path for a new status part, named so parts sort by creation time."""
+        parts_dir = os.path.join(self.output_dir, STATUS_PARTS_DIR)
+        return os.path.join(parts_dir, f"part-{time_ns():020d}-{uuid4().hex}.pkl")
+    
+    def compact_status(self):
+        """
+        Combine the saved status parts into Download_Status.xlsx.
+        
+        Duplicate reports are removed, keeping the latest entry. The parts are
+        also merged into a single part so the next compaction stays quick.
+        """
+        parts_dir = os.path.join(self.output_dir, STATUS_PARTS_DIR)
+        output_path = os.path.join(self.output_dir, "Download_Status.xlsx")
+        part_paths = sorted(glob.glob(os.path.join(parts_dir, "part-*.pkl")))
+        if not part_paths:
+            logger.info("No download status entries to report.")
+            return
+        
+        # Combine all parts, keeping the latest entry if there's a conflict
+        output_df = pd.concat([pd.read_pickle(path) for path in part_paths], ignore_index=True)
+        output_df.drop_duplicates(subset=["Brnum"], keep="last", inplace=True)
+        
+        # Replace the parts with one combined part
+        if len(part_paths) > 1:
+            output_df.to_pickle(self._new_status_part_path())
+            for path in part_paths:
+                os.remove(path)
         
         # Save to an Excel file
-        output_df.to_excel(output_path, index=False)
-        print(f'Download status report saved to: {output_path}')
+        write_excel(output_df, output_path)
+        logger.info('Download status report saved to: %s', output_path)
     
     def update_metadata(self, download_queue, reports_data):
         """Moved update_metadata to class method"""
         # Similar implementation as before but using self.xxx for paths
         # ...existing implementation changed to use class variables...
-        print("Updating metadata file...")
+        logger.info("Updating metadata file...")
         
         # Check if metadata file exists
         if not os.path.exists(self.metadata_path):
-            print(f"Creating new metadata file (not found at {self.metadata_path})")
+            logger.info("Creating new metadata file (not found at %s)", self.metadata_path)
             metadata_df = pd.DataFrame(columns=[self.id_column, 'pdf_downloaded'])
         else:
             # Load existing metadata
-            metadata_df = pd.read_excel(self.metadata_path, sheet_name=0)
-            print(f"Loaded existing metadata with {len(metadata_df)} entries")
+            metadata_df = pd.read_excel(self.metadata_path, sheet_name=0, dtype={self.id_column: str})
+            logger.info("Loaded existing metadata with %s entries", len(metadata_df))
 
         # Get list of successfully downloaded files
         downloaded_files = self.get_existing_downloads()
-        print(f"Found {len(downloaded_files)} downloaded PDF files")
+        logger.info("Found %s downloaded PDF files", len(downloaded_files))
 
-        # Create a list for new metadata records
-        new_records = []
+        # Work out the download status of every report in one go
+        # (IDs are converted to strings for consistent comparison)
+        statuses = np.where(download_queue.index.astype(str).isin(downloaded_files), 'Yes', 'No')
 
-        # For each file we attempted to download, create a new record
-        for report_id in download_queue.index:
-            # Convert ID to string for consistent comparison
-            status = 'Yes' if str(report_id) in downloaded_files else 'No'
-            
-            # Create a record with the same columns as the metadata file
-            new_record = {self.id_column: report_id, 'pdf_downloaded': status}
-            
-            # Copy any other columns from the source file that we want to preserve
-            if report_id in reports_data.index:
-                for col in reports_data.columns:
-                    # Only copy columns that exist in the metadata file and haven't been set yet
-                    if col in metadata_df.columns and col not in [self.id_column, 'pdf_downloaded']:
-                        new_record[col] = reports_data.loc[report_id, col]
-        
-            new_records.append(new_record)
+        # Copy any other columns from the source file that we want to preserve -
+        # only columns that exist in the metadata file and haven't been set yet
+        columns_to_copy = [
+            col for col in reports_data.columns
+            if col in metadata_df.columns and col not in [self.id_column, 'pdf_downloaded']
+        ]
+        unique_reports = reports_data[~reports_data.index.duplicated(keep='last')]
+        copied_columns = unique_reports.reindex(download_queue.index)[columns_to_copy]
 
-        # Create DataFrame from new records
-        new_data = pd.DataFrame(new_records)
-        print(f"Created {len(new_data)} new metadata entries")
+        # Create a record for each file we attempted to download, with the same
+        # columns as the metadata file
+        new_data = pd.concat([
+            pd.DataFrame({self.id_column: download_queue.index, 'pdf_downloaded': statuses}, index=download_queue.index),
+            copied_columns
+        ], axis=1).reset_index(drop=True)
+        logger.info("Created %s new metadata entries", len(new_data))
 
-        # Make a backup of the original metadata
-        backup_path = os.path.join(self.output_dir, "Metadata2006_2016_Backup.xlsx")
-        metadata_df.to_excel(backup_path, index=False)
-        print(f"Saved metadata backup to: {backup_path}")
+        # Make a backup of the original metadata - at most one per day, saved as
+        # a pickle because that is much faster to write than Excel and keeps the
+        # column types (see the README for how to restore one)
+        backup_path = os.path.join(self.output_dir, f"Metadata2006_2016_Backup-{date.today().isoformat()}.pkl")
+        if not os.path.exists(backup_path):
+            metadata_df.to_pickle(backup_path)
+            logger.info("Saved metadata backup to: %s", backup_path)
+
+            # Remove the oldest backups (ISO dates sort in date order)
+            backups = sorted(glob.glob(os.path.join(self.output_dir, "Metadata2006_2016_Backup-*.pkl")))
+            for old_backup in backups[:-METADATA_BACKUPS_TO_KEEP]:
+                os.remove(old_backup)
 
         # Append the new data to the existing metadata
         updated_metadata = pd.concat([metadata_df, new_data], ignore_index=True)
@@ -265,21 +523,21 @@ class PDF_Downloader:
         after_dedup = len(updated_metadata)
         
         if before_dedup != after_dedup:
-            print(f"Removed {before_dedup - after_dedup} duplicate entries")
+            logger.info("Removed %s duplicate entries", before_dedup - after_dedup)
 
         # Update the original metadata file
-        updated_metadata.to_excel(self.metadata_path, index=False)
-        print(f"Saved updated metadata with {len(updated_metadata)} entries to: {self.metadata_path}")
+        write_excel(updated_metadata, self.metadata_path)
+        logger.info("Saved updated metadata with %s entries to: %s", len(updated_metadata), self.metadata_path)
     
     def upload_to_drive(self):
         """Moved upload_to_drive to class method"""
-        print("\nStarting Google Drive Upload\n")
+        logger.info("Starting Google Drive Upload")
         
         # Check if client_secrets.json exists
         if not os.path.exists("client_secrets.json"):
-            print("ERROR: client_secrets.json not found in the project directory.")
-            print("Please download your OAuth credentials from the Google Cloud Console")
-            print("and save them as client_secrets.json in this directory.")
+            logger.error("ERROR: client_secrets.json not found in the project directory.")
+            logger.error("Please download your OAuth credentials from the Google Cloud Console")
+            logger.error("and save them as client_secrets.json in this directory.")
             return False
         
         try:
@@ -291,16 +549,16 @@ class PDF_Downloader:
             
             if gauth.credentials is None:
                 # No credentials available, need to authenticate
-                print("No stored credentials found. Starting authentication flow...")
-                print("A browser window will open for you to authorize access.")
+                logger.info("No stored credentials found. Starting authentication flow...")
+                logger.info("A browser window will open for you to authorize access.")
                 gauth.LocalWebserverAuth()
             elif gauth.access_token_expired:
                 # Credentials exist but are expired
-                print("Credentials expired. Refreshing...")
+                logger.info("Credentials expired. Refreshing...")
                 gauth.Refresh()
             else:
                 # Credentials exist and are valid
-                print("Using existing credentials")
+                logger.info("Using existing credentials")
                 gauth.Authorize()
                 
             # Save the current credentials
@@ -312,10 +570,10 @@ class PDF_Downloader:
             downloaded_files = glob.glob(os.path.join(self.download_dir, "*.pdf"))
             
             if not downloaded_files:
-                print("No PDF files found to upload.")
+                logger.info("No PDF files found to upload.")
                 return True
                 
-            print(f"Found {len(downloaded_files)} PDF files to upload.")
+            logger.info("Found %s PDF files to upload.", len(downloaded_files))
             
             # Create a folder for our uploads if it doesn't exist
             folder_name = "PDF-Downloader-Uploads"
@@ -327,7 +585,7 @@ class PDF_Downloader:
             # Use the first folder found (if any)
             if file_list:
                 folder_id = file_list[0]['id']
-                print(f"Using existing folder: {folder_name}")
+                logger.info("Using existing folder: %s", folder_name)
             else:
                 # Create the folder
                 folder_metadata = {
@@ -342,117 +600,182 @@ class PDF_Downloader:
                     'value': 'anyone',
                     'role': 'reader'
                 })
-                print(f"Created new folder: {folder_name}")
+                logger.info("Created new folder: %s", folder_name)
             
-            # Upload each file to Google Drive
-            successful_uploads = 0
-            for file_path in downloaded_files:
-                file_name = os.path.basename(file_path)
-                
-                try:
-                    # Check if file already exists
-                    existing_files = drive.ListFile({'q': f"title='{file_name}' and '{folder_id}' in parents and trashed=false"}).GetList()
-                    
-                    if existing_files:
-                        print(f"File {file_name} already exists in Google Drive. Skipping.")
-                        successful_uploads += 1
-                        continue
-                    
-                    # Create a file on Google Drive
-                    drive_file = drive.CreateFile({
-                        'title': file_name,
-                        'parents': [{'id': folder_id}]
-                    })
-                    
-                    # Set the content
-                    drive_file.SetContentFile(file_path)
-                    
-                    # Upload the file
-                    drive_file.Upload()
-                    
-                    # Report the status
-                    print(f"✓ Uploaded {file_name} to Google Drive")
-                   
-                    successful_uploads += 1
-                
-                except Exception as e:
-                    print(f"✗ Error uploading {file_name}: {str(e)}")
+            # Get the names and checksums of all files already in the folder with
+            # one query, instead of asking Google Drive about each file separately.
+            # maxResults is left out so GetList() fetches every page of results
+            existing_files = {
+                drive_file['title']: drive_file for drive_file in drive.ListFile({
+                    'q': f"'{folder_id}' in parents and trashed=false",
+                    'fields': 'items(id,title,md5Checksum),nextPageToken'
+                }).GetList()
+            }
+            
+            # Upload the files to Google Drive in parallel
+            with ThreadPoolExecutor(max_workers=MAX_UPLOAD_THREADS, thread_name_prefix='Upload') as executor:
+                results = executor.map(
+                    lambda file_path: self._upload_file(drive, file_path, folder_id, existing_files),
+                    downloaded_files
+                )
+                successful_uploads = sum(results)
 
             # Print the folder link and upload status      
-            print(f"\nUploaded {successful_uploads} of {len(downloaded_files)} files to Google Drive")
-            print(f"\nFolder: https://drive.google.com/drive/folders/{folder_id}")
+            logger.info("Uploaded %s of %s files to Google Drive", successful_uploads, len(downloaded_files))
+            logger.info("Folder: https://drive.google.com/drive/folders/%s", folder_id)
             return True
                 
         except Exception as e:
-            print(f"Error during Google Drive upload: {str(e)}")
-            print("Make sure client_secrets.json exists in the project directory.")
+            logger.error("Error during Google Drive upload: %s", e)
+            logger.error("Make sure client_secrets.json exists in the project directory.")
+            return False
+    
+    def _upload_file(self, drive, file_path, folder_id, existing_files):
+        """
+        Upload a single file to the Google Drive folder.
+        
+        Files that are already on Drive with the same content are skipped, and
+        files whose content has changed replace the copy on Drive.
+        
+        Returns:
+            bool: True if the file was uploaded or is already up to date on Drive
+        """
+        file_name = os.path.basename(file_path)
+        
+        try:
+            existing_file = existing_files.get(file_name)
+            
+            # Skip files that are already in the folder with the same content
+            if existing_file is not None and existing_file.get('md5Checksum') == file_md5(file_path):
+                logger.info("File %s already exists in Google Drive. Skipping.", file_name)
+                return True
+            
+            if existing_file is not None:
+                # Replace the content of the file already on Google Drive
+                drive_file = drive.CreateFile({'id': existing_file['id']})
+            else:
+                # Create a file on Google Drive
+                drive_file = drive.CreateFile({
+                    'title': file_name,
+                    'parents': [{'id': folder_id}]
+                })
+            
+            # Set the content
+            drive_file.SetContentFile(file_path)
+            
+            # Upload the file. pydrive2 sends the content as a resumable upload;
+            # retry a few times if Google Drive has a temporary server error
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    drive_file.Upload()
+                    break
+                except ApiRequestError as e:
+                    if e.error.get('code', 0) < 500 or attempt == MAX_RETRIES:
+                        raise
+                    sleep(2 ** attempt)
+            
+            # Report the status
+            if existing_file is not None:
+                logger.info("✓ Updated %s on Google Drive", file_name)
+            else:
+                logger.info("✓ Uploaded %s to Google Drive", file_name)
+            return True
+        
+        except Exception as e:
+            logger.error("✗ Error uploading %s: %s", file_name, e)
             return False
     
     def run(self):
         """Main method to orchestrate the PDF download process."""
         # Read the Excel file
         try:
-            print(f"\nReading reports data from {self.reports_path}...")
-            reports_data = pd.read_excel(self.reports_path, sheet_name=0, index_col=self.id_column)
-            print(f"   Found {len(reports_data)} reports in the file")
+            logger.info("Reading reports data from %s...", self.reports_path)
+            reports_data = self.load_reports()
+            logger.info("   Found %s reports in the file", len(reports_data))
         except FileNotFoundError:
-            print(f"ERROR: Reports file not found at {self.reports_path}")
-            print("Please make sure the file exists and try again.")
+            logger.error("ERROR: Reports file not found at %s", self.reports_path)
+            logger.error("Please make sure the file exists and try again.")
             return
         except Exception as e:
-            print(f"ERROR: Could not read reports file: {e}")
+            logger.error("ERROR: Could not read reports file: %s", e)
             return
         
         # Keep only rows with valid download URLs
-        print("\nFinding reports with valid download URLs...")
-        has_valid_url = (reports_data.Pdf_URL.notnull()) | (reports_data['Report Html Address'].notnull())
-        reports_data = reports_data[has_valid_url]
-        print(f"   Found {len(reports_data)} reports with valid URLs")
+        logger.info("Finding reports with valid download URLs...")
+        reports_data['url'] = self.get_download_urls(reports_data)
+        reports_data = reports_data[reports_data['url'].notna()]
+        logger.info("   Found %s reports with valid URLs", len(reports_data))
         
         # Make a copy for download processing
         download_queue = reports_data.copy()
 
         # Check which files have already been downloaded
-        print("\nChecking for previously downloaded reports...")
+        logger.info("Checking for previously downloaded reports...")
         existing_downloads = self.get_existing_downloads()
-        print(f"   Found {len(existing_downloads)} already downloaded PDFs")
+        logger.info("   Found %s already downloaded PDFs", len(existing_downloads))
         
         # Remove files that have already been downloaded
-        to_download = [idx for idx in download_queue.index if str(idx) not in existing_downloads]
-        download_queue = download_queue.loc[to_download]
-        print(f"   {len(download_queue)} reports need to be downloaded")
+        already_downloaded = download_queue.index.astype(str).isin(existing_downloads)
+        download_queue = download_queue[~already_downloaded]
+        logger.info("   %s reports need to be downloaded", len(download_queue))
 
         # Limit batch size to prevent overloading
         if len(download_queue) > self.max_downloads:
-            print(f"\nLimiting to {self.max_downloads} downloads this run (from {len(download_queue)} available)")
+            logger.info("Limiting to %s downloads this run (from %s available)", self.max_downloads, len(download_queue))
             download_queue = download_queue.head(self.max_downloads)
         else:
-            print(f"\nWill download all {len(download_queue)} reports")
+            logger.info("Will download all %s reports", len(download_queue))
 
-        # List to track any errors that occur during downloading
-        download_errors = []
+        # Error message for each report that failed to download
+        download_errors = {}
 
         # Download the PDFs
         if len(download_queue) > 0:
             self.download_pdfs(download_queue, download_errors)
         else:
-            print("\nNo new reports to download.")
+            logger.info("No new reports to download.")
         
         # Generate reports
-        print("Creating reports...")
+        logger.info("Creating reports...")
         self.create_output_report(download_queue, download_errors)
+        self.compact_status()
         self.update_metadata(download_queue, reports_data)
 
         # Upload to Google Drive
         self.upload_to_drive()
 
-        print("\nProgram completed successfully.")
+        logger.info("Program completed successfully.")
 
 
 # MAIN PROGRAM
 def main():
-    downloader = PDF_Downloader()
-    downloader.run()
+    # Log messages from the worker threads are put on a queue and printed by
+    # a single listener thread, so downloads never wait for the console
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = QueueListener(log_queue, console_handler)
+    
+    root_logger = logging.getLogger()
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(logging.INFO)
+    listener.start()
+    
+    # Avoid looking up the same host again for every download. This replaces
+    # socket.getaddrinfo for the whole process, so it is only done here and
+    # undone when the program finishes
+    enable_dns_cache()
+    
+    try:
+        downloader = PDF_Downloader()
+        downloader.run()
+    finally:
+        disable_dns_cache()
+        
+        # Print any remaining messages before exiting
+        listener.stop()
+        root_logger.removeHandler(queue_handler)
 
 # Run the program if this file is executed directly
 if __name__ == '__main__':
@@ -1,11 +1,18 @@
 import unittest  # Python's built-in testing framework
+import copy
 import sys
 import os
 import pandas as pd  # For Excel file operations
 import shutil  # For file and directory operations
 import logging  # For structured logging
 import time
+import threading
+import tempfile
 from pathlib import Path  # Object-oriented filesystem paths
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from requests.adapters import HTTPAdapter
+from openpyxl import Workbook, load_workbook
 
 # Add parent directory to path so we can import PDF_Downloader module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -13,38 +20,161 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import the module we want to test
 from PDF_Downloader import PDF_Downloader
 
+# Read Excel files with the much faster calamine parser when it's installed
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+    EXCEL_ENGINE_KWARGS = {}
+except ImportError:
+    # Otherwise use openpyxl, but only load the cell values - the test files
+    # have no styles, formulas or links worth parsing
+    EXCEL_ENGINE = 'openpyxl'
+    EXCEL_ENGINE_KWARGS = {'read_only': True, 'data_only': True, 'keep_links': False}
+
+
+def read_xlsx_rows(path):
+    """Read the header and rows of an xlsx file's first sheet as plain tuples.
+    
+    Used where a test only counts rows or looks up a few cells, so no
+    DataFrame needs to be built.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        return header, list(rows)
+    finally:
+        workbook.close()
+
+
+def metadata_statuses(path):
+    """Map each report ID in a metadata file to its pdf_downloaded value."""
+    header, rows = read_xlsx_rows(path)
+    id_column, status_column = header.index('BRnum'), header.index('pdf_downloaded')
+    return {row[id_column]: row[status_column] for row in rows}
+
+
+def write_excel_columns(columns, path):
+    """Write a dict of column name -> values to an xlsx file.
+    
+    The test files only hold a few plain values, so the rows are written
+    straight to a write-only workbook without building a DataFrame first.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(list(columns))
+    for row in zip(*columns.values()):
+        worksheet.append(row)
+    workbook.save(path)
+
+# Keep the test files in memory (tmpfs) when the system has one
+TEMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Set RUN_NETWORK_TESTS=1 to also run the tests that download from real websites
+RUN_NETWORK_TESTS = os.environ.get('RUN_NETWORK_TESTS') == '1'
+
+# A tiny but valid PDF file served instead of real downloads
+FAKE_PDF = b'%PDF-1.4\n1 0 obj<</Type/Catalog>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n'
+
+
+class _PDFHandler(BaseHTTPRequestHandler):
+    """Answers every request for a .pdf file with FAKE_PDF, and anything else with 404."""
+
+    def do_GET(self):
+        if not self.path.endswith('.pdf'):
+            self.send_error(404)
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(FAKE_PDF)))
+        self.end_headers()
+        self.wfile.write(FAKE_PDF)
+
+    def log_message(self, format, *args):
+        pass  # Don't print a line for every request
+
 # Set up logging configuration to track test progress
-logging.basicConfig(level=logging.INFO, 
+# (set TEST_LOG_LEVEL=WARNING to hide the progress messages, e.g. on CI)
+logging.basicConfig(level=os.environ.get('TEST_LOG_LEVEL', 'INFO'), 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)  # Get a logger for this module
 
 class PDFDownloaderIntegrationTests(unittest.TestCase):
     """Integration tests for PDF_Downloader using real files."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Start a local PDF server and build the test files once in a template directory."""
+        # Serve the test PDFs from this machine so the tests don't need the internet
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _PDFHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.server_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        
+        # Share one HTTP session between all tests so connections are reused.
+        # Failed requests aren't retried, and proxies from the environment are
+        # ignored so they can't intercept requests to the local server
+        cls._session = requests.Session()
+        cls._session.trust_env = False
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+        cls._session.mount('http://', adapter)
+        cls._session.mount('https://', adapter)
+        
+        # Create one configured PDF_Downloader that every test gets a copy of,
+        # instead of building a new one (and its unused session) for each test
+        cls._downloader_template = PDF_Downloader()
+        cls._downloader_template.max_downloads = 2  # Limit downloads to make tests faster
+        cls._downloader_template.max_concurrent_threads = 2
+        cls._downloader_template.session = cls._session
+        
+        # All test files live in one temporary directory that is removed once
+        # after the last test, instead of cleaning up after every test
+        cls._root = tempfile.TemporaryDirectory(prefix='pdfdl_', dir=TEMP_ROOT)
+        cls._template_dir = os.path.join(cls._root.name, 'template')
+        
+        # Create the same directory structure the tests use
+        os.makedirs(os.path.join(cls._template_dir, 'Downloads'))
+        os.makedirs(os.path.join(cls._template_dir, 'Output'))
+        
+        # Create test reports file with PDFs from the local server
+        cls.create_test_reports_file(os.path.join(cls._template_dir, 'test_reports.xlsx'))
+        
+        # Open the reports workbook once so tests can parse it without reopening it
+        cls._reports_xl = pd.ExcelFile(
+            os.path.join(cls._template_dir, 'test_reports.xlsx'),
+            engine=EXCEL_ENGINE, engine_kwargs=EXCEL_ENGINE_KWARGS
+        )
+        
+        # Create initial metadata file to track download status
+        cls.create_test_metadata_file(os.path.join(cls._template_dir, 'test_metadata.xlsx'))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the PDF server and session and remove all test files."""
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls._session.close()
+        cls._reports_xl.close()
+        cls._root.cleanup()
+        logger.info("Test cleanup: Removed test directory %s", cls._root.name)
+
     def setUp(self):
         """Set up test environment with actual files and directories."""
-        # Create test directory structure
-        self.test_dir = os.path.join(os.path.dirname(__file__), 'integration_test_data')
+        # Start every test from a fresh copy of the template files - copying a
+        # few small files is much faster than writing the Excel files again.
+        # Each test gets its own directory, named after the test
+        self.test_dir = os.path.join(self._root.name, self._testMethodName)
+        shutil.copytree(self._template_dir, self.test_dir)
+        
+        # Define paths for test directories and input files
         self.download_dir = os.path.join(self.test_dir, 'Downloads')
         self.output_dir = os.path.join(self.test_dir, 'Output')
-        
-        # Ensure directories exist (create if they don't)
-        os.makedirs(self.test_dir, exist_ok=True)
-        os.makedirs(self.download_dir, exist_ok=True)
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        # Define paths for test input files
         self.reports_path = os.path.join(self.test_dir, 'test_reports.xlsx')
         self.metadata_path = os.path.join(self.test_dir, 'test_metadata.xlsx')
         
-        # Create test reports file with reliable public PDFs that should be available online
-        self.create_test_reports_file()
-        
-        # Create initial metadata file to track download status
-        self.create_test_metadata_file()
-        
-        # Create PDF_Downloader instance with test configuration
-        self.downloader = PDF_Downloader()
+        # Copy the shared PDF_Downloader, which already uses the shared
+        # session and download threads
+        self.downloader = copy.copy(self._downloader_template)
         # Configure the downloader to use our test directories and files
         self.downloader.data_dir = self.test_dir
         self.downloader.download_dir = self.download_dir
@@ -52,37 +182,33 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         self.downloader.reports_path = self.reports_path
         self.downloader.metadata_path = self.metadata_path
         
-        # Limit downloads to make tests faster
-        self.downloader.max_downloads = 2
-        self.downloader.max_concurrent_threads = 2
-        
-        logger.info(f"Test environment set up at: {self.test_dir}\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("Test environment set up at: %s", self.test_dir)
 
-    def create_test_reports_file(self):
-        """Create a test reports Excel file with real, reliable PDF URLs."""
-        # Use reliable PDF URLs that are likely to remain available
+    @classmethod
+    def create_test_reports_file(cls, reports_path):
+        """Create a test reports Excel file with PDF URLs on the local server."""
         test_data = {
             'BRnum': ['TEST001', 'TEST002', 'TEST003', 'TEST004'], 
             'Pdf_URL': [
-                'http://cdn12.a1.net/m/resources/media/pdf/A1-Umwelterkl-rung-2016-2017.pdf', 
-                'https://www.hkexnews.hk/listedco/listconews/sehk/2017/0512/ltn20170512165.pdf',  
-                'https://ebooks.exakta.se/aak/2017/hallbarhetsrapport_2016_2017_en/pubData/source/aak_sustainability_report_2016_2017_ebook.pdf',  
+                f'{cls.server_url}/TEST001.pdf', 
+                f'{cls.server_url}/TEST002.pdf',  
+                f'{cls.server_url}/TEST003.pdf',  
                 None  # Test with missing URL
             ],
             'Report Html Address': [
                 None,
                 None,
                 None,
-                'https://www.ab-science.com/file_bdd/content/1480493978_DDRVF.pdf' 
+                f'{cls.server_url}/TEST004.pdf' 
             ], 
         }
         
-        # Create the Excel file with pandas
-        pd.DataFrame(test_data).to_excel(self.reports_path, index=False)
-        logger.info(f"Created test reports file: {self.reports_path}")
+        # Create the Excel file
+        write_excel_columns(test_data, reports_path)
+        logger.info("Created test reports file: %s", reports_path)
 
-    def create_test_metadata_file(self):
+    @staticmethod
+    def create_test_metadata_file(metadata_path):
         """Create a test metadata Excel file."""
         # Initial metadata with no downloads
         test_data = {
@@ -91,35 +217,34 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         }
         
         # Create the Excel file
-        pd.DataFrame(test_data).to_excel(self.metadata_path, index=False)
-        logger.info(f"Created test metadata file: {self.metadata_path}")
+        write_excel_columns(test_data, metadata_path)
+        logger.info("Created test metadata file: %s", metadata_path)
 
     def test_excel_file_reading(self):
         """Test that the downloader can read Excel files correctly."""
         # Read the reports file using pandas directly
-        reports_data = pd.read_excel(self.reports_path)
+        reports_data = self._reports_xl.parse(0)
         
-        # Read the metadata file using pandas directly
-        metadata = pd.read_excel(self.metadata_path)
+        # Read the metadata file's header and rows
+        metadata_columns, metadata_rows = read_xlsx_rows(self.metadata_path)
         
         # Verify that reading was successful with assertions
         self.assertEqual(len(reports_data), 4, "Should read 4 reports")
         self.assertIn('BRnum', reports_data.columns, "Reports should have BRnum column")
         self.assertIn('Pdf_URL', reports_data.columns, "Reports should have Pdf_URL column")
         
-        self.assertEqual(len(metadata), 2, "Should read 2 metadata records")
-        self.assertIn('pdf_downloaded', metadata.columns, "Metadata should have pdf_downloaded column")
+        self.assertEqual(len(metadata_rows), 2, "Should read 2 metadata records")
+        self.assertIn('pdf_downloaded', metadata_columns, "Metadata should have pdf_downloaded column")
         
-        logger.info("Excel file reading test passed successfully\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("Excel file reading test passed successfully")
 
     def test_get_existing_downloads(self):
         """Test the get_existing_downloads method."""
         # Create test files in the download directory
         test_files = ['TEST001.pdf', 'TEST002.pdf']
+        payload = b'Test PDF content'
         for file in test_files:
-            with open(os.path.join(self.download_dir, file), 'w') as f:
-                f.write('Test PDF content')
+            Path(self.download_dir, file).write_bytes(payload)
         
         # Call the method directly
         existing_downloads = self.downloader.get_existing_downloads()
@@ -129,41 +254,41 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         self.assertIn('TEST001', existing_downloads, "Should find TEST001.pdf")
         self.assertIn('TEST002', existing_downloads, "Should find TEST002.pdf")
         
-        logger.info("get_existing_downloads test passed successfully\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("get_existing_downloads test passed successfully")
 
     def test_url_extraction(self):
         """Test URL extraction from input files."""
         # Read the Excel file directly
-        reports_data = pd.read_excel(self.reports_path, index_col=self.downloader.id_column)
+        reports_data = self._reports_xl.parse(0, index_col=self.downloader.id_column)
         
-        # Check for valid download URLs
-        has_valid_url = (reports_data.Pdf_URL.notnull()) | (reports_data['Report Html Address'].notnull())
-        reports_with_urls = reports_data[has_valid_url]
+        # Find which reports have a primary and/or secondary URL
+        has_primary = reports_data.Pdf_URL.notna().to_numpy()
+        has_secondary = reports_data['Report Html Address'].notna().to_numpy()
         
         # Verify URL extraction
-        self.assertEqual(len(reports_with_urls), 4, "Should find 4 reports with URLs")
+        self.assertEqual(int((has_primary | has_secondary).sum()), 4, "Should find 4 reports with URLs")
         
-        # Count primary vs. secondary URLs
-        primary_urls = reports_data[reports_data.Pdf_URL.notnull()]
-        secondary_urls = reports_data[(reports_data.Pdf_URL.isnull()) & (reports_data['Report Html Address'].notnull())]
+        # Count primary vs. secondary URLs (secondary is only used without a primary)
+        self.assertEqual(int(has_primary.sum()), 3, "Should find 3 reports with primary URLs")
+        self.assertEqual(int((~has_primary & has_secondary).sum()), 1, "Should find 1 report with secondary URL")
         
-        self.assertEqual(len(primary_urls), 3, "Should find 3 reports with primary URLs")
-        self.assertEqual(len(secondary_urls), 1, "Should find 1 report with secondary URL")
+        # The downloader should pick the same URLs
+        download_urls = self.downloader.get_download_urls(reports_data)
+        self.assertEqual(int(download_urls.notna().sum()), 4, "Downloader should find a URL for all 4 reports")
         
-        logger.info("URL extraction test passed successfully\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("URL extraction test passed successfully")
 
     def test_download_file(self):
         """Test the download_file method for a single file."""
-        # Create a mock row for a reliable URL
+        # Create a mock row for a PDF on the local server
         mock_row = pd.Series({
-            'Pdf_URL': 'http://cdn12.a1.net/m/resources/media/pdf/A1-Umwelterkl-rung-2016-2017.pdf',
-            'Report Html Address': None
+            'Pdf_URL': f'{self.server_url}/TEST999.pdf',
+            'Report Html Address': None,
+            'url': f'{self.server_url}/TEST999.pdf'
         })
         
-        # Create an empty list to capture any errors
-        download_errors = []
+        # Create an empty dict to capture any errors
+        download_errors = {}
         
         # Call the download_file method directly
         self.downloader.download_file('TEST999', mock_row, download_errors)
@@ -178,16 +303,37 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         
         logger.info("download_file test passed successfully")
 
+    @unittest.skipUnless(RUN_NETWORK_TESTS, "set RUN_NETWORK_TESTS=1 to download from real websites")
+    def test_download_file_from_network(self):
+        """Test the download_file method against a real website."""
+        # Use a session that really connects to the internet
+        self.downloader.session = PDF_Downloader().session
+        url = 'http://cdn12.a1.net/m/resources/media/pdf/A1-Umwelterkl-rung-2016-2017.pdf'
+        mock_row = pd.Series({'Pdf_URL': url, 'Report Html Address': None, 'url': url})
+        download_errors = {}
+        
+        # Call the download_file method directly
+        self.downloader.download_file('TEST999', mock_row, download_errors)
+        
+        # Check the real file was downloaded without errors
+        downloaded_file = os.path.join(self.download_dir, 'TEST999.pdf')
+        self.assertTrue(os.path.exists(downloaded_file), "File should be downloaded")
+        self.assertGreater(os.path.getsize(downloaded_file), len(FAKE_PDF), "File should be the real PDF")
+        self.assertEqual(len(download_errors), 0, "No errors should occur")
+        
+        logger.info("download_file network test passed successfully")
+
     def test_download_with_error(self):
         """Test error handling in the download_file method."""
         # Create a mock row with a broken URL
         mock_row = pd.Series({
             'Pdf_URL': 'https://invalid-url-that-wont-work.example/test.pdf',
-            'Report Html Address': None
+            'Report Html Address': None,
+            'url': 'https://invalid-url-that-wont-work.example/test.pdf'
         })
         
-        # Create a list to capture errors
-        download_errors = []
+        # Create a dict to capture errors
+        download_errors = {}
         
         # Call the download_file method directly
         self.downloader.download_file('TEST888', mock_row, download_errors)
@@ -198,79 +344,39 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         
         # Verify errors were captured
         self.assertGreater(len(download_errors), 0, "Errors should be captured")
-        self.assertEqual(download_errors[0], 'TEST888', "Error should reference correct ID")
-        
-        logger.info("download error handling test passed successfully\n")
-        logger.info("--------------------------------------------------\n")
-
-    def test_file_download_and_status_tracking(self):
-        """Test actual file downloading and status tracking in output files."""
-        # Run the downloader with the test files
-        self.downloader.run()
-        
-        # Check if files were downloaded to the output directory
-        downloaded_files = os.listdir(self.download_dir)
-        logger.info(f"Downloaded files: {downloaded_files}")
-        
-        # At least some files should be downloaded
-        self.assertGreater(len(downloaded_files), 0, "No files were downloaded")
-        
-        # Verify that PDF files were created with the correct naming convention
-        pdf_files = [f for f in downloaded_files if f.endswith('.pdf')]
-        self.assertGreater(len(pdf_files), 0, "No PDF files were downloaded")
-        
-        # Check the status report was created
-        status_file = os.path.join(self.output_dir, "Download_Status.xlsx")
-        self.assertTrue(os.path.exists(status_file), "Download status report was not created")
-        
-        # Check status report contents
-        status_df = pd.read_excel(status_file)
-        self.assertGreater(len(status_df), 0, "Status report is empty")
-        
-        # Verify required columns exist
-        self.assertIn('Status', status_df.columns, "Status column missing from report")
-        self.assertIn('Brnum', status_df.columns, "Brnum column missing from report")
+        self.assertIn('TEST888', download_errors, "Error should reference correct ID")
         
-        # Check for both successful and failed downloads in status column
-        status_values = status_df['Status'].astype(str).str.lower()
-        
-        # Look for success indicators in status
-        has_success = any(status_values.str.contains('downloaded'))
-        
-        # This assertion might fail if all downloads fail (e.g., due to network issues)
-        # So we log it but don't make it a hard requirement
-        if not has_success:
-            logger.warning("No successful downloads found in status report")
-            
-        logger.info("File download and status tracking test completed\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("download error handling test passed successfully")
 
     def test_create_output_report(self):
         """Test the create_output_report method."""
         # Create a test download queue
         download_queue = pd.DataFrame({
-            'Pdf_URL': ['http://cdn12.a1.net/m/resources/media/pdf/A1-Umwelterkl-rung-2016-2017.pdf', 'http://example.com/test2.pdf'],
+            'Pdf_URL': [f'{self.server_url}/TEST777.pdf', 'http://example.com/test2.pdf'],
             'Report Html Address': [None, None]
         }, index=['TEST777', 'TEST778'])
+        download_queue['url'] = self.downloader.get_download_urls(download_queue)
         
-        self.downloader.download_file('TEST777', download_queue.loc['TEST777'], [])
+        self.downloader.download_file('TEST777', download_queue.loc['TEST777'], {})
 
         # Create a test downloaded file (just one to test both success and failure cases)    
         #with open(os.path.join(self.download_dir, 'TEST777.pdf'), 'w') as f:
             #f.write('Test content')
         
-        # Create error list
-        download_errors = ['TEST778', 'Connection timeout']
+        # Create error messages
+        download_errors = {'TEST778': 'Connection timeout'}
         
-        # Call the method directly
+        # Call the method directly and build the Excel report
         self.downloader.create_output_report(download_queue, download_errors)
+        self.downloader.compact_status()
         
         # Check the status report was created
         status_file = os.path.join(self.output_dir, "Download_Status.xlsx")
         self.assertTrue(os.path.exists(status_file), "Status report should be created")
         
         # Verify contents
-        status_df = pd.read_excel(status_file)
+        status_df = pd.read_excel(status_file, usecols=['Brnum', 'Status'],
+                                 engine=EXCEL_ENGINE, engine_kwargs=EXCEL_ENGINE_KWARGS)
         self.assertEqual(len(status_df), 2, "Should have 2 status entries")
         
         # Find each test ID in the report
@@ -280,8 +386,7 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         self.assertEqual(test777_status, "Downloaded", "TEST777 should show as Downloaded")
         self.assertEqual(test778_status, "Failed", "TEST778 should show as Failed")
         
-        logger.info("create_output_report test passed successfully\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("create_output_report test passed successfully")
 
     def test_metadata_updating(self):
         """Test the update_metadata method directly."""
@@ -297,8 +402,7 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         }, index=['TEST555', 'TEST556'])
         
         # Create a test downloaded file (just one to test both success and failure cases)
-        with open(os.path.join(self.download_dir, 'TEST555.pdf'), 'w') as f:
-            f.write('Test content')
+        Path(self.download_dir, 'TEST555.pdf').write_bytes(b'Test content')
         
         # Call the update_metadata method directly
         self.downloader.update_metadata(download_queue, reports_data)
@@ -306,23 +410,18 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         # Verify the metadata file was updated
         self.assertTrue(os.path.exists(self.metadata_path), "Metadata file should exist")
         
-        # Read the updated metadata
-        updated_metadata = pd.read_excel(self.metadata_path)
-        
-        # Find the test entries in the metadata
-        test555_entry = updated_metadata[updated_metadata['BRnum'] == 'TEST555']
-        test556_entry = updated_metadata[updated_metadata['BRnum'] == 'TEST556']
+        # Read the updated download status of every report
+        statuses = metadata_statuses(self.metadata_path)
         
         # Verify entries exist
-        self.assertGreater(len(test555_entry), 0, "TEST555 should be in metadata")
-        self.assertGreater(len(test556_entry), 0, "TEST556 should be in metadata")
+        self.assertIn('TEST555', statuses, "TEST555 should be in metadata")
+        self.assertIn('TEST556', statuses, "TEST556 should be in metadata")
         
         # Verify download status
-        self.assertEqual(test555_entry['pdf_downloaded'].iloc[0], 'Yes', "TEST555 should be marked as downloaded")
-        self.assertEqual(test556_entry['pdf_downloaded'].iloc[0], 'No', "TEST556 should be marked as not downloaded")
+        self.assertEqual(statuses['TEST555'], 'Yes', "TEST555 should be marked as downloaded")
+        self.assertEqual(statuses['TEST556'], 'No', "TEST556 should be marked as not downloaded")
         
-        logger.info("update_metadata test passed successfully\n")
-        logger.info("--------------------------------------------------\n")
+        logger.info("update_metadata test passed successfully")
 
     def test_comprehensive_workflow(self):
         """Test the complete workflow from reading files to updating metadata."""
@@ -330,16 +429,16 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         comprehensive_data = {
             'BRnum': ['COMP001', 'COMP002', 'COMP003', 'COMP004', 'COMP005'],
             'Pdf_URL': [
-                'http://cdn12.a1.net/m/resources/media/pdf/A1-Umwelterkl-rung-2016-2017.pdf',  # Should succeed
+                f'{self.server_url}/COMP001.pdf',  # Should succeed
                 'https://invalid-url-that-wont-work.example/test.pdf',  # Should fail
                 None,  # Missing URL
-                'https://www.hkexnews.hk/listedco/listconews/sehk/2017/0512/ltn20170512165.pdf',  # Should succeed
+                f'{self.server_url}/COMP004.pdf',  # Should succeed
                 'not-a-valid-url'  # Invalid format
             ],
             'Report Html Address': [
                 None,
                 None,
-                'https://ebooks.exakta.se/aak/2017/hallbarhetsrapport_2016_2017_en/pubData/source/aak_sustainability_report_2016_2017_ebook.pdf',  # HTML instead of PDF
+                f'{self.server_url}/COMP003.pdf',  # Secondary URL instead of PDF URL
                 None,
                 None
             ],
@@ -347,7 +446,7 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         
         # Create the comprehensive test file
         comp_test_path = os.path.join(self.test_dir, 'comprehensive_test.xlsx')
-        pd.DataFrame(comprehensive_data).to_excel(comp_test_path, index=False)
+        write_excel_columns(comprehensive_data, comp_test_path)
         
         # Update downloader to use this file and allow processing more records
         self.downloader.reports_path = comp_test_path
@@ -355,10 +454,10 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         
         # Create a fresh metadata file for this test
         comp_metadata_path = os.path.join(self.test_dir, 'comprehensive_metadata.xlsx')
-        pd.DataFrame({
+        write_excel_columns({
             'BRnum': ['COMP001', 'COMP003'],
             'pdf_downloaded': ['No', 'No'],
-        }).to_excel(comp_metadata_path, index=False)
+        }, comp_metadata_path)
         self.downloader.metadata_path = comp_metadata_path
         
         # Run the complete workflow
@@ -367,55 +466,55 @@ class PDFDownloaderIntegrationTests(unittest.TestCase):
         # Check all aspects of the workflow
         
         # 1. Verify downloads occurred
-        downloaded_files = os.listdir(self.download_dir)
-        pdf_files = [f for f in downloaded_files if f.endswith('.pdf')]
-        self.assertGreater(len(pdf_files), 0, "No PDF files were downloaded")
-        
-        # 2. Check for specific downloaded files (we expect this one to succeed)
-        expected_file = "COMP001.pdf"
-        self.assertIn(expected_file, downloaded_files, f"Expected file {expected_file} not found")
+        with self.subTest("downloads"):
+            with os.scandir(self.download_dir) as entries:
+                pdf_files = {entry.name[:-4] for entry in entries if entry.name.endswith('.pdf')}
+            logger.info("Downloaded files: %s", pdf_files)
+            self.assertGreater(len(pdf_files), 0, "No PDF files were downloaded")
+            
+            # Check for specific downloaded files (we expect this one to succeed)
+            expected_file = "COMP001"
+            self.assertIn(expected_file, pdf_files, f"Expected file {expected_file}.pdf not found")
+        
+        # 2. Verify status report was created with correct structure
+        with self.subTest("status report"):
+            status_file = os.path.join(self.output_dir, "Download_Status.xlsx")
+            self.assertTrue(os.path.exists(status_file), "Download status report was not created")
+            
+            status_df = pd.read_excel(status_file, usecols=['Brnum', 'Status'],
+                                     engine=EXCEL_ENGINE, engine_kwargs=EXCEL_ENGINE_KWARGS)
+            self.assertGreaterEqual(len(status_df), 3, "Status report should have at least 3 entries")
+            
+            # Verify required columns exist
+            self.assertIn('Status', status_df.columns, "Status column missing from report")
+            self.assertIn('Brnum', status_df.columns, "Brnum column missing from report")
+            
+            # Check for all expected BR numbers in the status report
+            br_nums_in_report = set(status_df['Brnum'].astype(str))
+            self.assertIn('COMP001', br_nums_in_report, "COMP001 should be in status report")
+            
+            # Check for both successful and failed downloads in status column
+            status_values = set(status_df['Status'])
+            self.assertIn('Downloaded', status_values, "No successful downloads found in status report")
+            self.assertIn('Failed', status_values, "No failed downloads found in status report")
+        
+        # 3. Check metadata was updated
+        with self.subTest("metadata"):
+            statuses = metadata_statuses(comp_metadata_path)
+            
+            # The metadata should now include the other records as well
+            self.assertGreaterEqual(len(statuses), 2, "Metadata should retain at least 2 records")
+            
+            # Get the status for COMP001 (we expect this download to succeed)
+            comp001_status = statuses.get('COMP001')
+            
+            # COMP001 should have been updated to 'Yes' or contain success status info
+            if comp001_status is not None:
+                comp001_status_str = str(comp001_status).lower()
+                self.assertTrue(comp001_status_str == 'yes' or 'success' in comp001_status_str,
+                               f"COMP001 should show successful download, found: {comp001_status}")
         
-        # 3. Verify status report was created with correct structure
-        status_file = os.path.join(self.output_dir, "Download_Status.xlsx")
-        self.assertTrue(os.path.exists(status_file), "Download status report was not created")
-        
-        status_df = pd.read_excel(status_file)
-        self.assertGreaterEqual(len(status_df), 3, "Status report should have at least 3 entries")
-        
-        # 4. Check for all expected BR numbers in the status report
-        br_nums_in_report = status_df['Brnum'].astype(str).tolist()
-        self.assertIn('COMP001', br_nums_in_report, "COMP001 should be in status report")
-        
-        # 5. Check metadata was updated
-        updated_metadata = pd.read_excel(comp_metadata_path)
-        
-        # The metadata should now include the other records as well
-        self.assertGreaterEqual(len(updated_metadata), 2, "Metadata should retain at least 2 records")
-        
-        # Get the status for COMP001 (we expect this download to succeed)
-        comp001_status = None
-        for _, row in updated_metadata.iterrows():
-            if row['BRnum'] == 'COMP001':
-                comp001_status = row.get('pdf_downloaded')
-                break
-        
-        # COMP001 should have been updated to 'Yes' or contain success status info
-        if comp001_status is not None:
-            comp001_status_str = str(comp001_status).lower()
-            self.assertTrue(comp001_status_str == 'yes' or 'success' in comp001_status_str,
-                           f"COMP001 should show successful download, found: {comp001_status}")
-        
-        logger.info("Comprehensive workflow test completed successfully\n")
-        logger.info("--------------------------------------------------\n")
-
-    def tearDown(self):
-        """Clean up after tests by removing test files and directories."""
-        try:
-            # Remove test directories
-            shutil.rmtree(self.test_dir, ignore_errors=True)
-            logger.info(f"Test cleanup: Removed test directory {self.test_dir}")
-        except Exception as e:
-            logger.warning(f"Test cleanup failed: {e}")
+        logger.info("Comprehensive workflow test completed successfully")
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)  # Run tests with detailed output
\ No newline at end of file
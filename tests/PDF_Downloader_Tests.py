@@ -1,26 +1,101 @@
 import unittest  
+import copy
+import io
 import sys
 import os
+import socket
 import pandas as pd  
 import glob  
+import functools
 import shutil  #
+import tempfile
 import requests  
+from datetime import date
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock, mock_open 
-import coverage  
+from pydrive2.files import GoogleDriveFileList
 
 # Add parent directory to path so we can import our module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Set up code coverage tracking - this helps us know which lines of code
-# are being tested and which ones aren't
-cov = coverage.Coverage(
-    source=['PDF_Downloader'],  # Module to measure
-    omit=['*/tests/*', '*/site-packages/*']  # Don't measure these paths
-)
-cov.start()  # Start measuring
+# are being tested and which ones aren't. Tracing slows down every line that
+# runs, so it's only done when this file is run directly with ENABLE_COVERAGE
+# set (use `coverage run -m unittest` for other ways of running the tests)
+cov = None
+if __name__ == '__main__' and os.environ.get('ENABLE_COVERAGE'):
+    import coverage
+    cov = coverage.Coverage(
+        source=['PDF_Downloader'],  # Module to measure
+        omit=['*/tests/*', '*/site-packages/*']  # Don't measure these paths
+    )
+    cov.start()  # Start measuring
+
+# Read result files with the much faster calamine parser when it's installed.
+# Every test writes its own new files, so there is nothing to gain from
+# caching the parsed results between tests
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# Keep the test files in memory (tmpfs) when the system has one
+TEMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else None
 
 # Import the module we want to test
-from PDF_Downloader import PDF_Downloader
+import PDF_Downloader as PDF_Downloader_module
+from PDF_Downloader import PDF_Downloader, main
+
+#############################################################################
+#                         Test Helpers                                      #
+#############################################################################
+
+class FakeTransport(requests.adapters.BaseAdapter):
+    """A requests transport adapter that answers from registered URLs
+    
+    Mounted on a session it replaces the real network, so the full requests
+    code path runs without making an actual connection. Every request sent
+    is recorded in `calls` together with its send options.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+        self.calls = []
+
+    def register(self, url, content=b'', status=200, exc=None):
+        """Answer `url` with `content`, or raise `exc` when it is given"""
+        self.routes[url] = (content, status, exc)
+
+    def send(self, request, **kwargs):
+        self.calls.append((request.url, kwargs))
+        content, status, exc = self.routes.get(request.url, (b'', 404, None))
+        if exc is not None:
+            raise exc
+        response = requests.Response()
+        response.status_code = status
+        response.raw = io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+@functools.lru_cache(maxsize=None)
+def _download_queue_template():
+    """Build the standard two-report queue once"""
+    return pd.DataFrame({
+        'Pdf_URL': ['http://example.com/1.pdf', 'http://example.com/2.pdf'],
+        'Report Html Address': ['', '']
+    }, index=['12345', '67890'])
+
+
+def make_download_queue():
+    """Return a fresh copy of the standard queue: reports 12345 and 67890, each with a PDF URL"""
+    return _download_queue_template().copy()
 
 #############################################################################
 #                         Main Test Class                                   #
@@ -33,38 +108,74 @@ class TestPDFDownloader(unittest.TestCase):
     # Setup and Teardown                    #
     #########################################
 
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary folder and downloader shared by all tests in the class
+        
+        Each test works in its own subfolder, and everything is deleted
+        once in tearDownClass instead of after every test. Each test gets
+        a copy of the downloader, so settings changed by one test don't
+        leak into the next.
+        """
+        cls._root = tempfile.TemporaryDirectory(prefix='pdfdl_unit_', dir=TEMP_ROOT)
+        cls._downloader_template = PDF_Downloader()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the downloader's session and remove all test files"""
+        cls._downloader_template.session.close()
+        cls._root.cleanup()
+    
     def setUp(self):
         """Set up a test environment before each test
         
         This method creates a fresh test environment before each test runs.
         It creates temporary directories and a PDF_Downloader instance for testing.
         """
-        # Create test directories
-        self.test_data_dir = os.path.join(os.path.dirname(__file__), 'test_data')
+        # Create test directories - one subfolder per test so tests don't share files
+        self.test_data_dir = os.path.join(self._root.name, self._testMethodName)
         self.test_download_dir = os.path.join(self.test_data_dir, 'Downloads')
         self.test_output_dir = os.path.join(self.test_data_dir, 'Output')
         
-        # Make sure directories exist
-        os.makedirs(self.test_data_dir, exist_ok=True)
+        # Make sure directories exist (this also creates test_data_dir)
         os.makedirs(self.test_download_dir, exist_ok=True)
         os.makedirs(self.test_output_dir, exist_ok=True)
         
-        # Create a PDF_Downloader object with our test settings
-        self.downloader = PDF_Downloader()
+        # Copy the shared PDF_Downloader object and give it our test settings
+        self.downloader = copy.copy(self._downloader_template)
         self.downloader.data_dir = self.test_data_dir
         self.downloader.download_dir = self.test_download_dir
         self.downloader.output_dir = self.test_output_dir
         self.downloader.reports_path = os.path.join(self.test_data_dir, 'test_reports.xlsx')
         self.downloader.metadata_path = os.path.join(self.test_data_dir, 'test_metadata.xlsx')
     
-    def tearDown(self):
-        """Clean up after each test
+    def mock_transport(self):
+        """Give the downloader a session that is answered by a FakeTransport"""
+        transport = FakeTransport()
+        self.downloader.session = requests.Session()
+        self.downloader.session.mount('http://', transport)
+        self.downloader.session.mount('https://', transport)
+        return transport
+    
+    def mock_google_drive(self):
+        """Patch Google authentication and Drive for the rest of the test
         
-        This method removes all test files and directories after each test.
+        client_secrets.json is reported as present and the Drive has no
+        folders or files. Returns the auth and drive mocks so a test only
+        has to change what it cares about.
         """
-        # Delete all test directories and their contents
-        if os.path.exists(self.test_data_dir):
-            shutil.rmtree(self.test_data_dir)
+        patchers = [
+            patch('os.path.exists', return_value=True),
+            patch('PDF_Downloader.GoogleAuth'),
+            patch('PDF_Downloader.GoogleDrive'),
+        ]
+        _, mock_auth_class, mock_drive_class = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        
+        mock_drive = mock_drive_class.return_value
+        mock_drive.ListFile.return_value.GetList.return_value = []
+        return mock_auth_class.return_value, mock_drive
     
     #########################################
     # Basic Functionality Tests             #
@@ -80,22 +191,30 @@ class TestPDFDownloader(unittest.TestCase):
     def test_get_existing_downloads_empty(self):
         """Test getting existing downloads from an empty directory"""
         # Clear the directory to make sure it's empty
-        for file in os.listdir(self.test_download_dir):
-            file_path = os.path.join(self.test_download_dir, file)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
+        with os.scandir(self.test_download_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.remove(entry.path)
             
         # Call the method and check result
         existing = self.downloader.get_existing_downloads()
-        self.assertEqual(existing, [])  # Should return empty list
+        self.assertEqual(existing, set())  # Should return empty set
+    
+    def test_get_existing_downloads_missing_dir(self):
+        """Test getting existing downloads before the download folder exists"""
+        # Remove the download directory entirely
+        shutil.rmtree(self.test_download_dir)
+        
+        # Call the method and check result
+        existing = self.downloader.get_existing_downloads()
+        self.assertEqual(existing, set())  # Should not raise
     
     def test_get_existing_downloads_with_files(self):
         """Test getting existing downloads with files present"""
-        # Create fake PDF files
+        # Create fake PDF files - only the names matter, so they can be empty
         test_files = ['12345.pdf', '67890.pdf', 'abcde.pdf']
         for file in test_files:
-            with open(os.path.join(self.test_download_dir, file), 'w') as f:
-                f.write('test content')
+            Path(self.test_download_dir, file).touch()
         
         # Get list of downloads
         existing = self.downloader.get_existing_downloads()
@@ -106,131 +225,211 @@ class TestPDFDownloader(unittest.TestCase):
         self.assertIn('67890', existing)
         self.assertIn('abcde', existing)
     
+    def clear_dns_cache(self):
+        """Start with an empty DNS cache and make sure the test leaves none behind"""
+        PDF_Downloader_module._dns_cache.clear()
+        self.addCleanup(PDF_Downloader_module._dns_cache.clear)
+        self.addCleanup(setattr, socket, 'getaddrinfo', socket.getaddrinfo)
+    
+    @patch('PDF_Downloader._original_getaddrinfo')
+    def test_dns_cache(self, mock_getaddrinfo):
+        """Test that repeated DNS lookups for the same host are cached"""
+        # STEP 1: Setup mock DNS result and start with an empty cache
+        mock_getaddrinfo.return_value = [('fake', 'address')]
+        self.clear_dns_cache()
+        
+        # STEP 2: Look up the same host twice
+        first = PDF_Downloader_module._cached_getaddrinfo('example.com', 443)
+        second = PDF_Downloader_module._cached_getaddrinfo('example.com', 443)
+        
+        # STEP 3: Verify only one real lookup was made
+        self.assertEqual(first, second)
+        mock_getaddrinfo.assert_called_once_with('example.com', 443)
+    
+    @patch('PDF_Downloader.DNS_CACHE_MAX_ENTRIES', 2)
+    @patch('PDF_Downloader._original_getaddrinfo')
+    def test_dns_cache_size_limit(self, mock_getaddrinfo):
+        """Test that the DNS cache drops the oldest lookups when it is full"""
+        # STEP 1: Setup mock DNS result and start with an empty cache
+        mock_getaddrinfo.return_value = [('fake', 'address')]
+        self.clear_dns_cache()
+        
+        # STEP 2: Look up one more host than the cache holds
+        for host in ['a.example.com', 'b.example.com', 'c.example.com']:
+            PDF_Downloader_module._cached_getaddrinfo(host, 443)
+        
+        # STEP 3: Only the two newest lookups are kept
+        cached_hosts = [key[0][0] for key in PDF_Downloader_module._dns_cache]
+        self.assertEqual(cached_hosts, ['b.example.com', 'c.example.com'])
+    
     #########################################
     # File Download Tests                   #
     #########################################
     
-    @patch('requests.get')
-    def test_download_file_success(self, mock_get):
-        """Test successful file download
+    def test_download_file(self):
+        """Test downloading a single file, successfully and with a network error
         
-        Uses mocking to simulate a successful HTTP download without making
-        an actual network request.
-        """
-        # STEP 1: Setup mock response (fake HTTP response)
-        mock_response = MagicMock()
-        mock_response.raise_for_status.return_value = None  # No HTTP errors
-        mock_response.content = b'PDF content'  # Fake PDF content
-        mock_get.return_value = mock_response  # Make requests.get return our fake response
-
-        # STEP 2: Setup test data
-        index = '12345'  # ID for the PDF
-        row = pd.Series({'Pdf_URL': 'http://example.com/test.pdf', 'Report Html Address': ''})
-        download_errors = []  # List to track errors
-    
-        # STEP 3: Call the function we're testing
-        self.downloader.download_file(index, row, download_errors)
-    
-        # STEP 4: Verify results
-        file_path = os.path.join(self.test_download_dir, f"{index}.pdf")
-        # Check file was created
-        self.assertTrue(os.path.exists(file_path))
-        # Check no errors were recorded
-        self.assertEqual(len(download_errors), 0)
-    
-    @patch('requests.get')
-    def test_download_file_network_error(self, mock_get):
-        """Test handling of network errors during download
+        Uses a fake transport to simulate the HTTP responses without making
+        an actual network request. Each case is run as a subtest:
         
-        Simulates a network failure to make sure the code handles errors gracefully.
+        | Case          | Response                   | Expected result             |
+        |---------------|----------------------------|-----------------------------|
+        | success       | b'PDF content'             | file saved, no errors       |
+        | network error | ConnectionError raised     | no file, error recorded     |
         """
-        # STEP 1: Setup mock to simulate network error
-        mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
-    
-        # STEP 2: Setup test data
-        index = '12345'
-        row = pd.Series({'Pdf_URL': 'http://example.com/test.pdf', 'Report Html Address': ''})
-        download_errors = []
-    
-        # STEP 3: Call the function
-        self.downloader.download_file(index, row, download_errors)
-    
-        # STEP 4: Verify results
-        file_path = os.path.join(self.test_download_dir, f"{index}.pdf")
-        # Check file was NOT created (download failed)
-        self.assertFalse(os.path.exists(file_path))
-    
-        # Check error was recorded properly
-        self.assertEqual(len(download_errors), 2)
-        self.assertEqual(download_errors[0], '12345')  # First item should be ID
-        self.assertIn('Connection refused', download_errors[1])  # Second should be error
+        # Case name, report ID, response content, exception raised by the transport
+        cases = [
+            ('success', '12345', b'PDF content', None),
+            ('network error', '67890', b'', requests.exceptions.ConnectionError("Connection refused")),
+        ]
+        
+        for name, index, content, exc in cases:
+            with self.subTest(name):
+                # STEP 1: Setup fake HTTP response for the PDF URL
+                url = f'http://example.com/{index}.pdf'
+                transport = self.mock_transport()
+                transport.register(url, content=content, exc=exc)
+                
+                # STEP 2: Setup test data
+                row = pd.Series({'Pdf_URL': url, 'Report Html Address': '', 'url': url})
+                download_errors = {}  # Error message for each failed download
+                
+                # STEP 3: Call the function we're testing
+                self.downloader.download_file(index, row, download_errors)
+                
+                # STEP 4: Verify results
+                file_path = os.path.join(self.test_download_dir, f"{index}.pdf")
+                # Check the temporary download file was moved into place or removed
+                self.assertFalse(os.path.exists(file_path + '.part'))
+                
+                if exc is None:
+                    # Check file was created with the downloaded content and no errors were recorded
+                    with open(file_path, 'rb') as f:
+                        self.assertEqual(f.read(), content)
+                    self.assertEqual(download_errors, {})
+                else:
+                    # Check file was NOT created and the error was stored under the ID
+                    self.assertFalse(os.path.exists(file_path))
+                    self.assertEqual(list(download_errors), [index])
+                    self.assertIn('Connection refused', download_errors[index])
     
-    @patch('requests.get')
-    def test_download_file_fallback_to_html_url(self, mock_get):
+    def test_download_file_fallback_to_html_url(self):
         """Test fallback to HTML URL when PDF URL is not available
         
         When a PDF URL is missing, the code should try the HTML URL instead.
         """
-        # STEP 1: Setup mock
-        mock_response = MagicMock()
-        mock_response.raise_for_status.return_value = None
-        mock_response.content = b'PDF content'
-        mock_get.return_value = mock_response
+        # STEP 1: Setup fake HTTP response for the HTML URL
+        transport = self.mock_transport()
+        transport.register('http://example.com/report.html', content=b'PDF content')
         
         # STEP 2: Setup test data - PDF URL is None, but HTML URL is provided
         index = '12345'
-        row = pd.Series({'Pdf_URL': None, 'Report Html Address': 'http://example.com/report.html'})
-        download_errors = []
+        download_queue = pd.DataFrame({
+            'Pdf_URL': [None, 'http://example.com/other.pdf'],
+            'Report Html Address': ['http://example.com/report.html', 'http://example.com/other.html']
+        }, index=[index, '67890'])
+        download_errors = {}
         
-        # STEP 3: Call the function
-        self.downloader.download_file(index, row, download_errors)
+        # STEP 3: Pick the URLs and download the first report
+        download_queue['url'] = self.downloader.get_download_urls(download_queue)
+        self.downloader.download_file(index, download_queue.loc[index], download_errors)
         
         # STEP 4: Verify results
         file_path = os.path.join(self.test_download_dir, f"{index}.pdf")
         self.assertTrue(os.path.exists(file_path))
         
+        # Check that the PDF URL is still preferred when there is one
+        self.assertEqual(download_queue.loc['67890', 'url'], 'http://example.com/other.pdf')
+        
         # Check that it used the HTML URL
-        mock_get.assert_called_once_with('http://example.com/report.html', verify=False, timeout=30)
+        self.assertEqual(len(transport.calls), 1)
+        url, options = transport.calls[0]
+        self.assertEqual(url, 'http://example.com/report.html')
+        self.assertEqual((options['verify'], options['timeout'], options['stream']), (False, (5, 30), True))
     
     #########################################
-    # Threading Tests                       #
+    # Concurrency Tests                     #
     #########################################
     
-    @patch('threading.Thread')
-    def test_download_pdfs(self, mock_thread):
-        """Test the download_pdfs method with threading
+    def test_download_pdfs(self):
+        """Test the download_pdfs method with concurrent downloads
         
-        Verifies that multiple PDFs are downloaded using parallel threads.
+        Verifies that every PDF in the queue is handed to download_file.
         """
-        # STEP 1: Setup mock thread
-        mock_thread_instance = MagicMock()
-        mock_thread.return_value = mock_thread_instance
+        # STEP 1: Create test data with two reports
+        download_queue = make_download_queue()
+        download_queue['url'] = self.downloader.get_download_urls(download_queue)
+        download_errors = {}
+    
+        # STEP 2: Call the function with download_file mocked out
+        with patch.object(self.downloader, 'download_file') as mock_download, \
+             patch('PDF_Downloader.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as mock_pool:
+            self.downloader.download_pdfs(download_queue, download_errors)
+    
+        # STEP 3: Verify results
+        # Check one thread pool of the configured size was used for all downloads
+        mock_pool.assert_called_once_with(max_workers=self.downloader.max_concurrent_threads,
+                                          thread_name_prefix='Download')
+        
+        # Check directories were created
+        self.assertTrue(os.path.exists(self.test_download_dir))
+        self.assertTrue(os.path.exists(self.test_output_dir))
     
-        # Make thread appear to run then complete
-        mock_thread_instance.is_alive.side_effect = [True, True, True, False, False]
+        # Check that both downloads were started
+        self.assertEqual(mock_download.call_count, 2)
+        downloaded_ids = sorted(call.args[0] for call in mock_download.call_args_list)
+        self.assertEqual(downloaded_ids, ['12345', '67890'])
     
-        # STEP 2: Create test data with two reports
+    def test_download_pdfs_invalid_url(self):
+        """Test that download_pdfs doesn't try to download invalid URLs
+        
+        Reports whose URL isn't an http(s) address are recorded as failed
+        without being handed to download_file.
+        """
+        # STEP 1: Create test data with one valid and one invalid URL
         data = {
-            'Pdf_URL': ['http://example.com/1.pdf', 'http://example.com/2.pdf'],
+            'Pdf_URL': ['http://example.com/1.pdf', 'not-a-valid-url'],
             'Report Html Address': ['', '']
         }
         download_queue = pd.DataFrame(data, index=['12345', '67890'])
-        download_errors = []
+        download_queue['url'] = self.downloader.get_download_urls(download_queue)
+        download_errors = {}
     
-        # STEP 3: Call the function
-        self.downloader.download_pdfs(download_queue, download_errors)
+        # STEP 2: Call the function with download_file mocked out
+        with patch.object(self.downloader, 'download_file') as mock_download:
+            self.downloader.download_pdfs(download_queue, download_errors)
     
-        # STEP 4: Verify results
-        # Check directories were created
-        self.assertTrue(os.path.exists(self.test_download_dir))
-        self.assertTrue(os.path.exists(self.test_output_dir))
+        # STEP 3: Only the valid URL was downloaded, the other one is recorded as an error
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(mock_download.call_args.args[0], '12345')
+        self.assertEqual(download_errors, {'67890': 'Invalid URL: not-a-valid-url'})
+    
+    def test_download_pdfs_url_with_spaces(self):
+        """Test that download_pdfs accepts real-world URLs with spaces
+        
+        URLs with spaces around them, spaces inside them or an upper case
+        scheme are valid, and are downloaded with the outer spaces removed.
+        """
+        # STEP 1: Create test data with URLs as they appear in the reports file
+        download_queue = pd.DataFrame({'url': [
+            ' http://example.com/padded.pdf ',
+            'https://example.com/AttachFileAction.do?fileName=Final SD Report 2016.pdf',
+            'HTTP://EXAMPLE.COM/UPPER.PDF'
+        ]}, index=['12345', '67890', 'abcde'])
+        download_errors = {}
     
-        # Check that threads were created for both downloads
-        self.assertEqual(mock_thread.call_count, 2)
-        self.assertEqual(mock_thread_instance.start.call_count, 2)
+        # STEP 2: Call the function with download_file mocked out
+        with patch.object(self.downloader, 'download_file') as mock_download:
+            self.downloader.download_pdfs(download_queue, download_errors)
     
-        # Verify thread monitoring happened
-        self.assertTrue(mock_thread_instance.is_alive.called)
+        # STEP 3: All three were downloaded, with the padding removed
+        self.assertEqual(download_errors, {})
+        downloaded = {call.args[0]: call.args[1]['url'] for call in mock_download.call_args_list}
+        self.assertEqual(downloaded, {
+            '12345': 'http://example.com/padded.pdf',
+            '67890': 'https://example.com/AttachFileAction.do?fileName=Final SD Report 2016.pdf',
+            'abcde': 'HTTP://EXAMPLE.COM/UPPER.PDF'
+        })
     
     #########################################
     # Reporting Tests                       #
@@ -244,50 +443,36 @@ class TestPDFDownloader(unittest.TestCase):
         """
         try:
             # STEP 1: Create test data - one success, one failure
-            data = {
-                self.downloader.id_column: ['12345', '67890'],
-                'Pdf_URL': ['http://example.com/1.pdf', 'http://example.com/2.pdf'],
-                'Report Html Address': ['', '']
-            }
-            download_queue = pd.DataFrame(data, index=['12345', '67890'])
-            download_errors = ['67890', 'Network error: Connection refused']
+            download_queue = make_download_queue()
+            download_errors = {'67890': 'Network error: Connection refused'}
 
             # Create a mock successful download file
             file_path = os.path.join(self.test_download_dir, "12345.pdf")
             with open(file_path, 'w') as f:
                 f.write('test content')
 
-            # STEP 2: Call the function
+            # STEP 2: Call the function and build the Excel report
             self.downloader.create_output_report(download_queue, download_errors)
+            self.downloader.compact_status()
 
             # STEP 3: Verify output file was created
             output_path = os.path.join(self.test_output_dir, "Download_Status.xlsx")
             self.assertTrue(os.path.exists(output_path))
 
             # STEP 4: Check the contents of the report
-            output_df = pd.read_excel(output_path)
+            output_df = pd.read_excel(output_path, engine=EXCEL_ENGINE)
         
             # Should have 2 rows (one per download)
             self.assertEqual(len(output_df), 2, f"Expected 2 rows, got {len(output_df)}")
         
             # Check for success and failure indicators in the report
-            has_downloaded = False
-            has_failed = False
-            has_connection_error = False
+            # Convert all values in each row to lowercase strings and join them
+            rows = output_df.fillna('').astype(str).agg(' '.join, axis=1).str.lower()
         
-            for _, row in output_df.iterrows():
-                # Convert all values to strings and join them
-                row_str = ' '.join([str(v).lower() for v in row.values])
-            
-                # Look for patterns showing success and failure
-                if '12345' in row_str and ('downloaded' in row_str or 'success' in row_str):
-                    has_downloaded = True
-            
-                if '67890' in row_str and ('failed' in row_str or 'error' in row_str):
-                    has_failed = True
-                
-                if 'connection refused' in row_str:
-                    has_connection_error = True
+            # Look for patterns showing success and failure
+            has_downloaded = (rows.str.contains('12345') & rows.str.contains('downloaded|success')).any()
+            has_failed = (rows.str.contains('67890') & rows.str.contains('failed|error')).any()
+            has_connection_error = rows.str.contains('connection refused').any()
         
             # Make sure we found all expected status indicators
             self.assertTrue(has_downloaded, "No row showing '12345' was downloaded")
@@ -298,6 +483,79 @@ class TestPDFDownloader(unittest.TestCase):
             # If anything goes wrong, fail with details
             self.fail(f"Test failed with error: {e}")
     
+    def test_write_excel(self):
+        """Test that write_excel produces a file pandas can read back
+        
+        Missing values should come back as empty cells.
+        """
+        # STEP 1: Create test data with a missing value
+        df = pd.DataFrame({
+            'Brnum': ['12345', '67890'],
+            'Status': ['Downloaded', 'Failed'],
+            'Year': [2020, None]
+        })
+        output_path = os.path.join(self.test_output_dir, 'written.xlsx')
+        
+        # STEP 2: Write and read back the file
+        PDF_Downloader_module.write_excel(df, output_path)
+        result = pd.read_excel(output_path, dtype={'Brnum': str})
+        
+        # STEP 3: Verify the contents survived the round trip
+        self.assertEqual(result.columns.tolist(), ['Brnum', 'Status', 'Year'])
+        self.assertEqual(result['Brnum'].tolist(), ['12345', '67890'])
+        self.assertEqual(result['Status'].tolist(), ['Downloaded', 'Failed'])
+        self.assertEqual(result['Year'].iloc[0], 2020)
+        self.assertTrue(pd.isna(result['Year'].iloc[1]))
+    
+    def test_compact_status_keeps_latest_entry(self):
+        """Test that status from several runs is combined into one report
+        
+        When a report appears in more than one run, only its latest status
+        should be kept.
+        """
+        # STEP 1: Record a failed run followed by a successful retry
+        download_queue = make_download_queue()
+        self.downloader.create_output_report(download_queue, {'12345': 'Network error: timeout'})
+        
+        file_path = os.path.join(self.test_download_dir, "12345.pdf")
+        with open(file_path, 'w') as f:
+            f.write('test content')
+        self.downloader.create_output_report(download_queue.loc[['12345']], {})
+        
+        # STEP 2: Build the Excel report
+        self.downloader.compact_status()
+        
+        # STEP 3: Verify one row per report with the latest status
+        output_path = os.path.join(self.test_output_dir, "Download_Status.xlsx")
+        output_df = pd.read_excel(output_path, engine=EXCEL_ENGINE, dtype={'Brnum': str}).set_index('Brnum')
+        self.assertEqual(len(output_df), 2)
+        self.assertEqual(output_df.loc['12345', 'Status'], 'Downloaded')
+        self.assertEqual(output_df.loc['67890', 'Status'], 'Failed')
+        
+        # STEP 4: Verify the parts were merged into one
+        parts = os.listdir(os.path.join(self.test_output_dir, 'status_parts'))
+        self.assertEqual(len(parts), 1)
+    
+    def test_compact_status_updates_existing_report(self):
+        """Test that an existing report shows the results of every later run
+        
+        Download_Status.xlsx is the file users open, so it must never be
+        left behind the saved status parts.
+        """
+        # STEP 1: Build a report from a first run
+        download_queue = make_download_queue()
+        output_path = os.path.join(self.test_output_dir, "Download_Status.xlsx")
+        self.downloader.create_output_report(download_queue.loc[['12345']], {})
+        self.downloader.compact_status()
+        self.assertEqual(len(pd.read_excel(output_path, engine=EXCEL_ENGINE)), 1)
+        
+        # STEP 2: Save a second run and rebuild the report
+        self.downloader.create_output_report(download_queue.loc[['67890']], {})
+        self.downloader.compact_status()
+        
+        # STEP 3: Verify the report already includes the second run
+        self.assertEqual(len(pd.read_excel(output_path, engine=EXCEL_ENGINE)), 2)
+    
     #########################################
     # Metadata Tests                        #
     #########################################
@@ -329,29 +587,19 @@ class TestPDFDownloader(unittest.TestCase):
         self.assertTrue(os.path.exists(self.downloader.metadata_path))
 
         # STEP 4: Check the contents of the metadata file
-        metadata_df = pd.read_excel(self.downloader.metadata_path)
+        metadata_df = pd.read_excel(self.downloader.metadata_path, engine=EXCEL_ENGINE)
     
         # Should have rows
         self.assertGreater(len(metadata_df), 0, "Metadata file is empty")
     
         # Check for IDs and download status
-        has_12345 = False
-        has_67890 = False
-        has_yes = False
-        has_no = False
-    
-        for _, row in metadata_df.iterrows():
-            row_str = ' '.join([str(v).lower() for v in row.values])
-        
-            if '12345' in row_str:
-                has_12345 = True
-                if 'yes' in row_str:  # Should be marked as downloaded
-                    has_yes = True
-                
-            if '67890' in row_str:
-                has_67890 = True
-                if 'no' in row_str:  # Should be marked as not downloaded
-                    has_no = True
+        rows = metadata_df.fillna('').astype(str).agg(' '.join, axis=1).str.lower()
+        is_12345 = rows.str.contains('12345')
+        is_67890 = rows.str.contains('67890')
+    
+        has_12345 = is_12345.any()
+        has_67890 = is_67890.any()
+        has_yes = (is_12345 & rows.str.contains('yes')).any()  # Should be marked as downloaded
     
         # Verify all expected data was found
         self.assertTrue(has_12345, "ID 12345 not found in metadata")
@@ -362,17 +610,18 @@ class TestPDFDownloader(unittest.TestCase):
         """Test update_metadata handles duplicates correctly
         
         When updating metadata with entries already present, the existing
-        entries should be updated rather than duplicated.
+        entries should be updated rather than duplicated. The metadata file
+        stores the IDs as numbers, like the real file does, so they only match
+        the text IDs of the downloads if they are read as text.
         """
-        # STEP 1: Create an existing metadata file
+        # STEP 1: Create an existing metadata file with numeric IDs
         existing_data = {
-            self.downloader.id_column: ['12345', '67890'],
+            self.downloader.id_column: [12345, 67890],
             'pdf_downloaded': ['No', 'No'],
             'Year': [2019, 2020]
         }
         metadata_df = pd.DataFrame(existing_data)
-        os.makedirs(os.path.dirname(self.downloader.metadata_path), exist_ok=True)
-        metadata_df.to_excel(self.downloader.metadata_path, index=False)
+        PDF_Downloader_module.write_excel(metadata_df, self.downloader.metadata_path)
         
         # STEP 2: Create new data with one duplicate entry (12345)
         new_data = {
@@ -393,12 +642,8 @@ class TestPDFDownloader(unittest.TestCase):
         self.downloader.update_metadata(download_queue, reports_data)
         
         # STEP 4: Check the updated metadata file
-        updated_df = pd.read_excel(self.downloader.metadata_path)
-        
-        # Debug information
-        print("Metadata DataFrame columns:", updated_df.columns.tolist())
-        print("Metadata DataFrame content:")
-        print(updated_df)
+        updated_df = pd.read_excel(self.downloader.metadata_path, engine=EXCEL_ENGINE,
+                                   dtype={self.downloader.id_column: str})
 
         # Should have 3 entries: the two original plus the new one
         self.assertEqual(len(updated_df), 3)
@@ -407,24 +652,42 @@ class TestPDFDownloader(unittest.TestCase):
         updated_record = updated_df[updated_df[self.downloader.id_column] == '12345']
         self.assertEqual(updated_record['pdf_downloaded'].values[0], 'Yes')
 
+    def test_update_metadata_prunes_old_backups(self):
+        """Test update_metadata keeps only the newest metadata backups
+
+        A backup is written once per day, and the oldest backups are removed
+        so the output directory doesn't keep growing.
+        """
+        # STEP 1: Create an existing metadata file and more old backups than we keep
+        metadata_df = pd.DataFrame({self.downloader.id_column: ['12345'], 'pdf_downloaded': ['No']})
+        os.makedirs(os.path.dirname(self.downloader.metadata_path), exist_ok=True)
+        PDF_Downloader_module.write_excel(metadata_df, self.downloader.metadata_path)
+        os.makedirs(self.downloader.output_dir, exist_ok=True)
+        for day in range(1, PDF_Downloader_module.METADATA_BACKUPS_TO_KEEP + 2):
+            metadata_df.to_pickle(os.path.join(self.downloader.output_dir, f"Metadata2006_2016_Backup-2000-01-0{day}.pkl"))
+
+        download_queue = pd.DataFrame({'Pdf_URL': ['http://example.com/1.pdf']}, index=['12345'])
+
+        # STEP 2: Call the function
+        self.downloader.update_metadata(download_queue, download_queue.copy())
+
+        # STEP 3: Today's backup exists and only the newest backups are kept
+        backups = sorted(glob.glob(os.path.join(self.downloader.output_dir, "Metadata2006_2016_Backup-*.pkl")))
+        self.assertEqual(len(backups), PDF_Downloader_module.METADATA_BACKUPS_TO_KEEP)
+        self.assertTrue(backups[-1].endswith(f"{date.today().isoformat()}.pkl"))
+        self.assertNotIn("2000-01-01", " ".join(backups))
+
     #########################################
     # Google Drive Tests                    #
     #########################################
     
-    @patch('PDF_Downloader.GoogleAuth')
-    @patch('PDF_Downloader.GoogleDrive')
-    @patch('os.path.exists')
-    def test_upload_to_drive(self, mock_exists, mock_drive_class, mock_auth_class):
+    def test_upload_to_drive(self):
         """Test Google Drive upload functionality
         
         Verifies files are uploaded to Google Drive correctly.
         """
         # STEP 1: Setup mocks
-        mock_exists.return_value = True  # Pretend files exist
-        mock_auth = MagicMock()
-        mock_auth_class.return_value = mock_auth
-        mock_drive = MagicMock()
-        mock_drive_class.return_value = mock_drive
+        mock_auth, mock_drive = self.mock_google_drive()
         
         # Mock folder already exists on Drive
         mock_folder = MagicMock()
@@ -441,8 +704,7 @@ class TestPDFDownloader(unittest.TestCase):
         # Mock file check (files don't exist on drive yet)
         mock_drive.ListFile.return_value.GetList.side_effect = [
             [mock_folder],  # First call: folder exists
-            [],  # Second call: 12345.pdf doesn't exist yet
-            []   # Third call: 67890.pdf doesn't exist yet
+            []  # Second call: folder has no files yet
         ]
         
         # STEP 3: Call the function
@@ -454,6 +716,86 @@ class TestPDFDownloader(unittest.TestCase):
         # 2 files should be created (uploaded)
         self.assertEqual(mock_drive.CreateFile.call_count, 2)
     
+    def test_upload_to_drive_skips_existing(self):
+        """Test that unchanged files in the Drive folder are not uploaded again
+        
+        The folder contents should be listed once instead of once per file,
+        and files are compared by MD5 checksum.
+        """
+        # STEP 1: Setup mocks
+        mock_auth, mock_drive = self.mock_google_drive()
+        
+        # STEP 2: Create mock PDF files to "upload"
+        for file in ['12345.pdf', '67890.pdf', 'abcde.pdf']:
+            with open(os.path.join(self.test_download_dir, file), 'w') as f:
+                f.write('test content')
+        same_md5 = PDF_Downloader_module.file_md5(os.path.join(self.test_download_dir, '12345.pdf'))
+        
+        # Folder exists, already has an identical 12345.pdf and an outdated 67890.pdf
+        mock_folder = {'id': '12345folder'}
+        mock_drive.ListFile.return_value.GetList.side_effect = [
+            [mock_folder],  # First call: folder exists
+            [  # Second call: files in the folder
+                {'id': 'file1', 'title': '12345.pdf', 'md5Checksum': same_md5},
+                {'id': 'file2', 'title': '67890.pdf', 'md5Checksum': 'outdated'}
+            ]
+        ]
+        
+        # STEP 3: Call the function
+        result = self.downloader.upload_to_drive()
+        
+        # STEP 4: Verify the unchanged file was skipped
+        self.assertTrue(result)
+        self.assertEqual(mock_drive.ListFile.call_count, 2)
+        created = [call.args[0] for call in mock_drive.CreateFile.call_args_list]
+        self.assertEqual(len(created), 2)
+        
+        # The changed file replaces the Drive copy and the new file is created
+        self.assertIn({'id': 'file2'}, created)
+        self.assertIn('abcde.pdf', [metadata.get('title') for metadata in created])
+    
+    def test_upload_to_drive_lists_every_page(self):
+        """Test that files on later pages of the folder listing are not uploaded again
+        
+        Google Drive returns the folder contents in pages, and a file that is
+        only on the second page must still be recognised as already uploaded.
+        """
+        # STEP 1: Setup mocks
+        mock_auth, mock_drive = self.mock_google_drive()
+        
+        # STEP 2: Create a mock PDF file to "upload"
+        file_path = os.path.join(self.test_download_dir, '12345.pdf')
+        with open(file_path, 'w') as f:
+            f.write('test content')
+        same_md5 = PDF_Downloader_module.file_md5(file_path)
+        
+        # The folder exists, and its contents come back in two pages with
+        # the identical 12345.pdf on the second one
+        pages = iter([
+            ([{'id': 'file1', 'title': 'other.pdf', 'md5Checksum': 'other'}], 'page2'),
+            ([{'id': 'file2', 'title': '12345.pdf', 'md5Checksum': same_md5}], None),
+        ])
+        
+        def get_page(file_list):
+            items, next_page_token = next(pages)
+            file_list.metadata = {'nextPageToken': next_page_token}
+            return items
+        
+        mock_folder_list = MagicMock()
+        mock_folder_list.GetList.return_value = [{'id': '12345folder'}]
+        mock_drive.ListFile.side_effect = lambda param: (
+            mock_folder_list if 'mimeType' in param['q'] else GoogleDriveFileList(mock_auth, param)
+        )
+        
+        # STEP 3: Call the function with Drive answering one page at a time
+        with patch.object(GoogleDriveFileList, '_GetList', autospec=True, side_effect=get_page):
+            result = self.downloader.upload_to_drive()
+        
+        # STEP 4: Verify both pages were read and the file was not uploaded again
+        self.assertTrue(result)
+        self.assertIsNone(next(pages, None))
+        mock_drive.CreateFile.assert_not_called()
+    
     @patch('os.path.exists')
     def test_upload_to_drive_missing_secrets(self, mock_exists):
         """Test upload_to_drive when Google API credentials are missing
@@ -469,9 +811,7 @@ class TestPDFDownloader(unittest.TestCase):
         # STEP 3: Verify result - should fail gracefully
         self.assertFalse(result)
 
-    @patch('PDF_Downloader.GoogleAuth')
-    @patch('os.path.exists')
-    def test_upload_to_drive_authentication_flow(self, mock_exists, mock_auth_class):
+    def test_upload_to_drive_authentication_flow(self):
         """Test different authentication scenarios in upload_to_drive
         
         Tests three authentication scenarios:
@@ -480,78 +820,34 @@ class TestPDFDownloader(unittest.TestCase):
         3. Valid credentials
         """
         # STEP 1: Setup common mocks
-        mock_exists.return_value = True
-        mock_auth = MagicMock()
-        mock_auth_class.return_value = mock_auth
-        
-        # STEP 2: Test Scenario 1 - No credentials
-        mock_auth.credentials = None
-        mock_auth.LoadCredentialsFile.return_value = None
-        
-        with patch('PDF_Downloader.GoogleDrive') as mock_drive_class:
-            mock_drive = MagicMock()
-            mock_drive_class.return_value = mock_drive
-            mock_drive.ListFile().GetList.return_value = []
-            mock_drive.ListFile().GetList.side_effect = [[], []]
-            
-            result = self.downloader.upload_to_drive()
-        
-        # Should trigger browser authentication
-        mock_auth.LocalWebserverAuth.assert_called_once()
-        
-        # Reset for next test
-        mock_auth.reset_mock()
-        
-        # STEP 3: Test Scenario 2 - Expired credentials
-        mock_auth.credentials = "something"
-        mock_auth.access_token_expired = True
-        
-        with patch('PDF_Downloader.GoogleDrive') as mock_drive_class:
-            mock_drive = MagicMock()
-            mock_drive_class.return_value = mock_drive
-            mock_drive.ListFile().GetList.return_value = []
-            mock_drive.ListFile().GetList.side_effect = [[], []]
-            
-            result = self.downloader.upload_to_drive()
-        
-        # Should refresh the token
-        mock_auth.Refresh.assert_called_once()
-        
-        # Reset for next test
-        mock_auth.reset_mock()
-        
-        # STEP 4: Test Scenario 3 - Valid credentials
-        mock_auth.credentials = "something"
-        mock_auth.access_token_expired = False
+        mock_auth, mock_drive = self.mock_google_drive()
         
-        with patch('PDF_Downloader.GoogleDrive') as mock_drive_class:
-            mock_drive = MagicMock()
-            mock_drive_class.return_value = mock_drive
-            mock_drive.ListFile().GetList.return_value = []
-            mock_drive.ListFile().GetList.side_effect = [[], []]
-            
-            result = self.downloader.upload_to_drive()
+        # Credentials, whether they have expired, and the method that should be used
+        scenarios = [
+            (None, False, 'LocalWebserverAuth'),  # Should trigger browser authentication
+            ("something", True, 'Refresh'),  # Should refresh the token
+            ("something", False, 'Authorize'),  # Should use existing credentials
+        ]
         
-        # Should use existing credentials
-        mock_auth.Authorize.assert_called_once()
+        # STEP 2: Run each scenario, forgetting the calls made by the previous one
+        for credentials, expired, expected_method in scenarios:
+            with self.subTest(expected_method):
+                mock_auth.reset_mock()
+                mock_auth.credentials = credentials
+                mock_auth.access_token_expired = expired
+                
+                self.downloader.upload_to_drive()
+                
+                # STEP 3: Verify the expected authentication method was used
+                getattr(mock_auth, expected_method).assert_called_once()
 
-    @patch('PDF_Downloader.GoogleAuth')
-    @patch('PDF_Downloader.GoogleDrive')
-    @patch('os.path.exists')
-    def test_upload_to_drive_create_folder(self, mock_exists, mock_drive_class, mock_auth_class):
+    def test_upload_to_drive_create_folder(self):
         """Test folder creation in upload_to_drive
         
         If the target folder doesn't exist on Drive, it should be created.
         """
-        # STEP 1: Setup mocks
-        mock_exists.return_value = True
-        mock_auth = MagicMock()
-        mock_auth_class.return_value = mock_auth
-        mock_drive = MagicMock()
-        mock_drive_class.return_value = mock_drive
-        
-        # Mock folder doesn't exist on Drive
-        mock_drive.ListFile.return_value.GetList.return_value = []
+        # STEP 1: Setup mocks - the folder doesn't exist on Drive
+        mock_auth, mock_drive = self.mock_google_drive()
         
         # STEP 2: Create mock PDF file
         os.makedirs(self.test_download_dir, exist_ok=True)
@@ -565,20 +861,13 @@ class TestPDFDownloader(unittest.TestCase):
         self.assertTrue(mock_drive.CreateFile.called)
         self.assertTrue(result)
 
-    @patch('PDF_Downloader.GoogleAuth')
-    @patch('PDF_Downloader.GoogleDrive')
-    @patch('os.path.exists')
-    def test_upload_to_drive_no_files(self, mock_exists, mock_drive_class, mock_auth_class):
+    def test_upload_to_drive_no_files(self):
         """Test upload_to_drive with no files to upload
         
         Should handle the case of an empty directory gracefully.
         """
         # STEP 1: Setup mocks
-        mock_exists.return_value = True
-        mock_auth = MagicMock()
-        mock_auth_class.return_value = mock_auth
-        mock_drive = MagicMock()
-        mock_drive_class.return_value = mock_drive
+        mock_auth, mock_drive = self.mock_google_drive()
         
         # STEP 2: Ensure no PDF files exist
         if os.path.exists(self.test_download_dir):
@@ -591,6 +880,82 @@ class TestPDFDownloader(unittest.TestCase):
         # STEP 4: Verify result - should succeed even with no files
         self.assertTrue(result)
 
+    #########################################
+    # Reports Loading Tests                 #
+    #########################################
+    
+    def test_load_reports_uses_cache(self):
+        """Test that the reports file is only parsed once while unchanged
+        
+        The second load should come from the cached copy in the output folder.
+        """
+        # STEP 1: Create test Excel file
+        data = {
+            self.downloader.id_column: ['12345', '67890'],
+            'Pdf_URL': ['http://example.com/1.pdf', 'http://example.com/2.pdf'],
+            'Report Html Address': ['', '']
+        }
+        PDF_Downloader_module.write_excel(pd.DataFrame(data), self.downloader.reports_path)
+        
+        # STEP 2: Load the reports twice, watching calls to read_excel
+        with patch('pandas.read_excel', wraps=pd.read_excel) as mock_read_excel:
+            first = self.downloader.load_reports()
+            second = self.downloader.load_reports()
+        
+        # STEP 3: Verify the Excel file was only read once and IDs are text
+        mock_read_excel.assert_called_once()
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(list(second.index), ['12345', '67890'])
+    
+    def test_load_reports_cache_detects_replaced_file(self):
+        """Test that the cache isn't used after the reports file is replaced
+        
+        Copying or checking out a file can give it an older modification time
+        than the cache, so the cache must match the file exactly.
+        """
+        # STEP 1: Load a reports file, which caches it
+        data = {
+            self.downloader.id_column: ['12345'],
+            'Pdf_URL': ['http://example.com/1.pdf'],
+            'Report Html Address': ['']
+        }
+        PDF_Downloader_module.write_excel(pd.DataFrame(data), self.downloader.reports_path)
+        self.downloader.load_reports()
+        
+        # STEP 2: Replace it with a different file with an old modification time
+        data[self.downloader.id_column] = ['67890']
+        PDF_Downloader_module.write_excel(pd.DataFrame(data), self.downloader.reports_path)
+        os.utime(self.downloader.reports_path, (0, 0))
+        
+        # STEP 3: Verify the new file is read instead of the cache
+        self.assertEqual(list(self.downloader.load_reports().index), ['67890'])
+    
+    def test_load_reports_ignores_corrupt_cache(self):
+        """Test that a damaged cache file falls back to reading the Excel file
+        
+        A run killed while saving the cache, or a pandas upgrade, can leave a
+        cache that can't be read. That must never stop the program.
+        """
+        # STEP 1: Load a reports file, which caches it
+        data = {
+            self.downloader.id_column: ['12345'],
+            'Pdf_URL': ['http://example.com/1.pdf'],
+            'Report Html Address': ['']
+        }
+        PDF_Downloader_module.write_excel(pd.DataFrame(data), self.downloader.reports_path)
+        self.downloader.load_reports()
+        
+        # STEP 2: Cut the cache file short
+        cache_paths = glob.glob(os.path.join(self.downloader.output_dir, '*_cache.pkl'))
+        self.assertEqual(len(cache_paths), 1)
+        with open(cache_paths[0], 'r+b') as f:
+            f.truncate(10)
+        
+        # STEP 3: Verify the Excel data is still returned and the cache is rebuilt
+        self.assertEqual(list(self.downloader.load_reports().index), ['12345'])
+        self.assertEqual(list(pd.read_pickle(cache_paths[0])['data'].index), ['12345'])
+        self.assertEqual(glob.glob(os.path.join(self.downloader.output_dir, '*.part')), [])
+    
     #########################################
     # Error Handling Tests                  #
     #########################################
@@ -605,10 +970,12 @@ class TestPDFDownloader(unittest.TestCase):
         mock_read_excel.side_effect = FileNotFoundError("File not found")
         
         # STEP 2: Call the function - should not crash
-        self.downloader.run()
+        with self.assertLogs('PDF_Downloader', level='ERROR') as logs:
+            self.downloader.run()
         
-        # STEP 3: Verify mock was called
+        # STEP 3: Verify mock was called and the error was logged
         mock_read_excel.assert_called_once()
+        self.assertIn('Reports file not found', logs.output[0])
 
     @patch('pandas.read_excel')
     def test_run_general_exception(self, mock_read_excel):
@@ -634,32 +1001,51 @@ class TestPDFDownloader(unittest.TestCase):
         
         Verifies the high-level workflow by mocking all components.
         """
+        # STEP 1: Create test reports data - loading it from Excel has its own tests
+        reports_data = make_download_queue()
+        
+        # STEP 2: Patch all methods
+        with patch.object(self.downloader, 'load_reports', return_value=reports_data), \
+             patch.object(self.downloader, 'get_existing_downloads', return_value=[]) as mock_get, \
+             patch.object(self.downloader, 'download_pdfs') as mock_download, \
+             patch.object(self.downloader, 'create_output_report') as mock_output, \
+             patch.object(self.downloader, 'compact_status') as mock_compact, \
+             patch.object(self.downloader, 'update_metadata') as mock_metadata, \
+             patch.object(self.downloader, 'upload_to_drive', return_value=True) as mock_upload:
+            # STEP 3: Run the method
+            self.downloader.run()
+        
+        # STEP 4: Verify all methods were called once
+        mock_get.assert_called_once()
+        mock_download.assert_called_once()
+        mock_output.assert_called_once()
+        mock_compact.assert_called_once_with()
+        mock_metadata.assert_called_once()
+        mock_upload.assert_called_once()
+
+
+    def test_run_skips_existing_downloads(self):
+        """Test that run only queues reports that have not been downloaded yet"""
         # STEP 1: Create test Excel file
         data = {
             self.downloader.id_column: ['12345', '67890'],
             'Pdf_URL': ['http://example.com/1.pdf', 'http://example.com/2.pdf'],
             'Report Html Address': ['', '']
         }
-        df = pd.DataFrame(data)
-        os.makedirs(os.path.dirname(self.downloader.reports_path), exist_ok=True)
-        df.to_excel(self.downloader.reports_path, index=False)
-        
-        # STEP 2: Patch all methods
-        with patch.object(self.downloader, 'get_existing_downloads', return_value=[]) as mock_get:
-            with patch.object(self.downloader, 'download_pdfs') as mock_download:
-                with patch.object(self.downloader, 'create_output_report') as mock_output:
-                    with patch.object(self.downloader, 'update_metadata') as mock_metadata:
-                        with patch.object(self.downloader, 'upload_to_drive', return_value=True) as mock_upload:
-                            # STEP 3: Run the method
-                            self.downloader.run()
-                            
-                            # STEP 4: Verify all methods were called in order
-                            mock_get.assert_called_once()
-                            mock_download.assert_called_once()
-                            mock_output.assert_called_once()
-                            mock_metadata.assert_called_once()
-                            mock_upload.assert_called_once()
-
+        PDF_Downloader_module.write_excel(pd.DataFrame(data), self.downloader.reports_path)
+        
+        # STEP 2: Run with 12345 already downloaded and the other steps mocked
+        with patch.object(self.downloader, 'get_existing_downloads', return_value={'12345'}), \
+             patch.object(self.downloader, 'download_pdfs') as mock_download, \
+             patch.object(self.downloader, 'create_output_report'), \
+             patch.object(self.downloader, 'compact_status'), \
+             patch.object(self.downloader, 'update_metadata'), \
+             patch.object(self.downloader, 'upload_to_drive', return_value=True):
+            self.downloader.run()
+        
+        # STEP 3: Verify only 67890 was queued for download
+        download_queue = mock_download.call_args.args[0]
+        self.assertEqual([str(idx) for idx in download_queue.index], ['67890'])
 
     @patch('PDF_Downloader.PDF_Downloader.run')
     def test_main_function(self, mock_run):
@@ -667,14 +1053,15 @@ class TestPDFDownloader(unittest.TestCase):
         
         Checks that the main() function correctly starts the downloader.
         """
-        # STEP 1: Import main
-        from PDF_Downloader import main
-        
-        # STEP 2: Call main
+        # STEP 1: Call main
+        self.clear_dns_cache()
         main()
         
-        # STEP 3: Verify run was called
+        # STEP 2: Verify run was called
         mock_run.assert_called_once()
+        
+        # STEP 3: Verify the DNS cache was only used while main was running
+        self.assertIs(socket.getaddrinfo, PDF_Downloader_module._original_getaddrinfo)
 
 
 # Run the tests when script is executed directly
@@ -683,15 +1070,16 @@ if __name__ == '__main__':
     result = unittest.main(exit=False, verbosity=2)
     
     # Generate coverage report
-    cov.stop()
-    cov.save()
-    print("\n\nCoverage Report:")
-    cov.report()
-    
-    # Create HTML coverage report for easy browsing
-    html_dir = os.path.join(os.path.dirname(__file__), 'coverage_html')
-    cov.html_report(directory=html_dir)
-    print(f"\nHTML coverage report generated in: {html_dir}")
+    if cov is not None:
+        cov.stop()
+        cov.save()
+        print("\n\nCoverage Report:")
+        cov.report()
+        
+        # Create HTML coverage report for easy browsing
+        html_dir = os.path.join(os.path.dirname(__file__), 'coverage_html')
+        cov.html_report(directory=html_dir)
+        print(f"\nHTML coverage report generated in: {html_dir}")
     
     # Exit with proper status code
     sys.exit(not result.result.wasSuccessful())
\ No newline at end of file